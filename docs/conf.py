@@ -20,17 +20,17 @@ project = "pyspeckle"
 master_doc = "index"
 
 
-def get_init_property(prop):
-    """Return property from __init__.py."""
+def get_init_property(prop, name="__init__.py"):
+    """Return property from __init__.py (or another file in the package)."""
     here = os.path.abspath(os.path.dirname(__file__))
-    file_name = os.path.join(here, "..", project, "__init__.py")
+    file_name = os.path.join(here, "..", project, name)
     regex = r'{}\s*=\s*[\'"]([^\'"]*)[\'"]'.format(prop)
     with open(file_name, "r", encoding="utf-8") as file:
         result = re.search(regex, file.read())
     return result.group(1)
 
 
-release = get_init_property("__version__")
+release = get_init_property("__version__", "_version.py")
 author = get_init_property("__author__")
 copyright = get_init_property("__copyright__")
 
@@ -16,6 +16,7 @@ Two dimensional functions::
 
     pyspeckle.local_contrast_2D(x, kernel)
     pyspeckle.local_contrast_2D_plot(x, kernel)
+    pyspeckle.local_contrast_2D_multiscale(x, sizes)
     pyspeckle.create_Exponential(M, pix_per_speckle)
     pyspeckle.create_Rayleigh(M, pix_per_speckle)
     pyspeckle.statistics_plot(x)
@@ -24,13 +25,97 @@ Three dimensional functions::
 
     pyspeckle.create_Exponential_3D(M, pix_per_speckle)
     pyspeckle.create_Rayleigh_3D(M, pix_per_speckle)
+
+Correlated fields in one, two, or three dimensions::
+
+    pyspeckle.create_gaussian_field(shape, mean, stdev, cl)
+    pyspeckle.create_copula_field(shape, cl, marginal)
+
+Subjective (imaged) speckle::
+
+    pyspeckle.random_phase_object(shape)
+    pyspeckle.create_Subjective(obj, NA, wavelength, dx)
+
+Speckle at arbitrary detector coordinates::
+
+    pyspeckle.create_Exponential_at(points, M, pix_per_speckle)
+
+Seamless speckle fields larger than memory::
+
+    field = pyspeckle.SpeckleField(pix_per_speckle, tile, seed)
+    field[y0:y1, x0:x1]
+
+Speckle from a broadband source::
+
+    pyspeckle.create_Polychromatic(M, pix_per_speckle, wavelengths)
+
+Speckle scattered by rough surfaces::
+
+    pyspeckle.rough_surface(shape, rms, cl, dx)
+    pyspeckle.propagate(field, wavelength, dx, z, method)
+    pyspeckle.create_Scattered(shape, rms, cl, wavelength, dx)
+
+Camera model::
+
+    pyspeckle.camera_counts(x, photons, read_noise, gain, bit_depth)
+
+Streams of patterns for training loops::
+
+    pyspeckle.SpeckleStream(M, pix_per_speckle, batch_size, prefetch)
+    pyspeckle.torch_dataset(M, pix_per_speckle)
+
+Displacement tracking between frames::
+
+    pyspeckle.reference_spectra(reference, subset, step)
+    pyspeckle.track_displacement(reference, frames, subset, step)
+
+Laser speckle contrast imaging (contrast to correlation time)::
+
+    pyspeckle.speckle_contrast(T, tau_c, model, beta, rho, nu)
+    pyspeckle.correlation_time(K, T, model, beta, rho, nu)
+    pyspeckle.flow_index(K, T)
+
+Multi-exposure speckle imaging fits::
+
+    pyspeckle.multi_exposure_contrast(frames, size)
+    pyspeckle.fit_mesi(K, T, beta, model)
+
+Persistent cache of seeded patterns::
+
+    cache = pyspeckle.SpeckleCache(directory, max_bytes)
+    cache(pyspeckle.create_Exponential, M, pix_per_speckle, seed=1)
+
+Planning and cost estimates::
+
+    pyspeckle.plan_Exponential(M, pix_per_speckle)
+    pyspeckle.plan_contrast(shape, kernel)
+
+Instrumentation of internal stages::
+
+    pyspeckle.record_stages()
+    pyspeckle.add_stage_callback(callback)
 """
 
-__version__ = "0.6.0"
+from ._version import __version__  # noqa: F401
+
 __author__ = "Scott Prahl"
 __email__ = "scott.prahl@oit.edu"
 __copyright__ = "2018-24, Scott Prahl"
 __license__ = "MIT"
 __url__ = "https://github.com/scottprahl/pyspeckle"
 
+from .instrument import *
+from .planner import *
 from .pyspeckle import *
+from .copula import *
+from .imaging import *
+from .sampling import *
+from .tiles import *
+from .polychromatic import *
+from .scattering import *
+from .camera import *
+from .stream import *
+from .tracking import *
+from .lsci import *
+from .mesi import *
+from .cache import *
@@ -0,0 +1,3 @@
+"""Version of pyspeckle, kept apart so that submodules can import it."""
+
+__version__ = "0.6.0"
@@ -0,0 +1,236 @@
+# pylint: disable=invalid-name
+# pylint: disable=consider-using-f-string
+
+"""
+Persistent on-disk cache of generated speckle patterns.
+
+Regression and calibration jobs often regenerate exactly the same patterns.
+A `SpeckleCache` stores the result of a seeded generator call as a `.npy`
+file named by a hash of the generator, its arguments, the seed, and the
+versions of pyspeckle and numpy.  Later calls with the same arguments
+return a read-only memory map of that file without copying it::
+
+    cache = pyspeckle.SpeckleCache("/scratch/speckle", max_bytes=20 * 2**30)
+    x = cache(pyspeckle.create_Exponential_3D, 512, 4, seed=7)
+
+Only calls with an explicit integer `seed` are cached because unseeded
+calls are meant to differ every time.
+
+Files are written to a temporary name and atomically renamed, so several
+processes can share a cache directory; at worst two processes generate the
+same pattern at the same time.  Each hit updates the modification time of
+its file and the least recently used files are removed whenever the cache
+grows beyond `max_bytes`.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+from ._version import __version__
+from .instrument import _stage
+
+__all__ = ("SpeckleCache",)
+
+
+def _default_directory():
+    """Return the cache directory from $PYSPECKLE_CACHE or ~/.cache/pyspeckle."""
+    directory = os.environ.get("PYSPECKLE_CACHE")
+    if directory:
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pyspeckle")
+
+
+def _canonical(obj):  # pylint: disable=too-many-return-statements
+    """
+    Convert an argument into a JSON-serializable value for hashing.
+
+    Arrays are represented by their dtype, shape, and a hash of their bytes.
+    Functions, classes, and modules (e.g., an array namespace) are
+    represented by their name.
+
+    Args:
+        obj: argument value
+
+    Returns:
+        value that `json.dumps` can serialize deterministically
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        digest = hashlib.sha256(np.ascontiguousarray(obj).tobytes()).hexdigest()
+        return {"array": digest, "dtype": obj.dtype.str, "shape": list(obj.shape)}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(x) for x in obj]
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items())}
+    if isinstance(obj, complex):
+        return [obj.real, obj.imag]
+    name = getattr(obj, "__qualname__", None) or getattr(obj, "__name__", None)
+    if name is not None:
+        return "%s.%s" % (getattr(obj, "__module__", ""), name)
+    raise TypeError("Cannot cache calls with an argument of type %s." % type(obj).__name__)
+
+
+class SpeckleCache:
+    """
+    Size-bounded, content-addressed cache of generated patterns.
+
+    Calling the cache object with a generator and its arguments returns
+    the cached result or generates, stores, and returns it.
+
+    Args:
+        directory: cache directory (None for $PYSPECKLE_CACHE or ~/.cache/pyspeckle)
+        max_bytes: total size of cached files before old ones are removed
+    """
+
+    def __init__(self, directory=None, max_bytes=2**30):
+        """Create the cache directory if needed."""
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive.")
+
+        self.directory = os.path.abspath(directory or _default_directory())
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, func, *args, **kwargs):
+        """
+        Return the hash that identifies a generator call.
+
+        Args:
+            func:     generator function
+            *args:    positional arguments
+            **kwargs: keyword arguments (must include an integer seed)
+
+        Returns:
+            hexadecimal string
+        """
+        seed = kwargs.get("seed")
+        if seed is None or isinstance(seed, np.random.Generator):
+            raise ValueError("Only calls with an integer seed can be cached.")
+
+        description = {
+            "func": _canonical(func),
+            "args": _canonical(args),
+            "kwargs": _canonical(kwargs),
+            "pyspeckle": __version__,
+            "numpy": np.__version__,
+        }
+        text = json.dumps(description, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        """Return the file name used for a key."""
+        return os.path.join(self.directory, key[:2], key + ".npy")
+
+    def __contains__(self, key):
+        """Return True if a pattern is stored for key."""
+        return os.path.exists(self.path(key))
+
+    def __call__(self, func, *args, **kwargs):
+        """
+        Return the cached result of `func(*args, **kwargs)`.
+
+        Args:
+            func:     generator function
+            *args:    positional arguments for func
+            **kwargs: keyword arguments for func (must include an integer seed)
+
+        Returns:
+            read-only `np.memmap` of the result
+        """
+        key = self.key(func, *args, **kwargs)
+        path = self.path(key)
+
+        try:
+            with _stage("SpeckleCache", "load") as st:
+                x = st.output(np.load(path, mmap_mode="r"))
+        except FileNotFoundError:
+            x = None
+
+        if x is not None:
+            # mark as recently used; another process may have just evicted it
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            return x
+
+        with _stage("SpeckleCache", "generate") as st:
+            x = st.output(np.asarray(func(*args, **kwargs)))
+
+        with _stage("SpeckleCache", "store") as st:
+            self._store(path, x)
+            x = st.output(np.load(path, mmap_mode="r"))
+
+        self.evict()
+        return x
+
+    def _store(self, path, x):
+        """Write x to path atomically so readers never see a partial file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, x)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _entries(self):
+        """Return (mtime, size, path) for every cached file."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size(self):
+        """Return the total size of the cached files in bytes."""
+        return sum(e[1] for e in self._entries())
+
+    def evict(self, max_bytes=None):
+        """
+        Remove least recently used files until the cache fits in max_bytes.
+
+        Files that another process has already removed or still has open
+        (on systems that forbid removing open files) are skipped.
+
+        Args:
+            max_bytes: size limit (None for the limit of the cache)
+
+        Returns:
+            number of files removed
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except (FileNotFoundError, PermissionError):
+                pass
+            total -= size
+        return removed
+
+    def clear(self):
+        """Remove every cached file."""
+        self.evict(0)
@@ -0,0 +1,112 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Convert speckle irradiance into the integer counts delivered by a camera.
+
+The speckle generators return float64 irradiance normalized to a maximum of
+one.  A camera converts that irradiance into photoelectrons (with Poisson
+shot noise), limits them to the full-well capacity, adds Gaussian read
+noise, divides by the conversion gain, adds a bias offset, and finally
+quantizes to an unsigned integer of the sensor bit depth.
+
+All of these steps are fused and done in chunks, so only a few small
+floating point temporaries exist at any time and the result is returned
+directly as uint8 or uint16.  For example::
+
+    x = pyspeckle.create_Exponential((1080, 1920), 4)
+    img = pyspeckle.camera_counts(x, photons=2000, read_noise=3, gain=2, bit_depth=12)
+"""
+
+import numpy as np
+
+from .instrument import _stage
+from .pyspeckle import _rng
+
+__all__ = ("camera_counts",)
+
+# number of pixels processed at once (keeps temporaries in cache)
+_CHUNK = 1 << 18
+
+
+def camera_counts(
+    x,
+    photons=1000,
+    quantum_efficiency=1,
+    shot_noise=True,
+    read_noise=0,
+    gain=1,
+    offset=0,
+    full_well=None,
+    bit_depth=8,
+    seed=None,
+):
+    """
+    Simulate the digital counts recorded by a camera.
+
+    The mean number of photons reaching a pixel with irradiance 1 is
+    `photons`.  The sensor model for each pixel is
+
+        electrons = Poisson(quantum_efficiency * photons * x)
+        electrons = min(electrons, full_well) + Normal(0, read_noise)
+        counts = clip(round(electrons / gain + offset), 0, 2**bit_depth - 1)
+
+    Any array shape is accepted, so a whole stack of frames can be converted
+    in one call.
+
+    Args:
+        x:                  speckle irradiance (any shape)
+        photons:            mean photons per pixel at unit irradiance
+        quantum_efficiency: fraction of photons converted to electrons
+        shot_noise:         if False, skip the Poisson sampling
+        read_noise:         standard deviation of read noise [electrons]
+        gain:               conversion gain [electrons/count]
+        offset:             bias added to every pixel [counts]
+        full_well:          maximum electrons per pixel (None for no limit)
+        bit_depth:          bits per pixel, 1 to 16
+        seed:               optional seed or `np.random.Generator`
+
+    Returns:
+        uint8 (bit_depth <= 8) or uint16 array with the same shape as x
+    """
+    if not 1 <= bit_depth <= 16:
+        raise ValueError("bit_depth must be between 1 and 16.")
+
+    if photons < 0 or not 0 <= quantum_efficiency <= 1:
+        raise ValueError("photons must be non-negative and 0 <= quantum_efficiency <= 1.")
+
+    if gain <= 0 or read_noise < 0:
+        raise ValueError("gain must be positive and read_noise non-negative.")
+
+    rng = _rng(seed)
+    x = np.asarray(x)
+    dtype = np.uint8 if bit_depth <= 8 else np.uint16
+    out = np.empty(x.shape, dtype=dtype)
+
+    scale = quantum_efficiency * photons
+    top = 2**bit_depth - 1
+    flat_x = x.reshape(-1)
+    flat_out = out.reshape(-1)
+
+    with _stage("camera_counts", "convert") as st:
+        for start in range(0, flat_x.size, _CHUNK):
+            stop = min(start + _CHUNK, flat_x.size)
+            e = np.multiply(flat_x[start:stop], scale, dtype=float)
+
+            if shot_noise:
+                np.maximum(e, 0, out=e)
+                e = rng.poisson(e).astype(float)
+
+            if full_well is not None:
+                np.minimum(e, full_well, out=e)
+
+            if read_noise:
+                e += rng.normal(0, read_noise, stop - start)
+
+            e /= gain
+            e += offset + 0.5
+            np.clip(e, 0, top, out=e)
+            flat_out[start:stop] = e
+
+        return st.output(out)
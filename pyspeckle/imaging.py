@@ -0,0 +1,225 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Simulate subjective (imaged) speckle.
+
+An object-plane field is imaged by a coherent optical system onto a camera.
+The image field is the object field low-pass filtered by the pupil of the
+imaging lens, and the camera records the irradiance integrated over each
+pixel.  This follows the subjective speckle algorithm of Duncan & Kirkpatrick,
+"Algorithms for simulation of speckle," in SPIE Vol. 6855 (2008).
+
+All lengths (wavelength, object sampling, pixel size) must be in the same
+units.  For example, a rough surface sampled every 0.5 µm imaged at 10x by
+an NA=0.25 lens at 0.633 µm onto a 5 µm pixel camera is::
+
+    obj = pyspeckle.random_phase_object((1024, 1024))
+    img = pyspeckle.create_Subjective(obj, 0.25, 0.633, 0.5, magnification=10, pixel_size=5)
+
+The pupil transfer function for each (grid, NA, wavelength, sampling, pupil)
+combination is computed once and cached.  Stacks of object fields are
+imaged with a single forward and inverse FFT.
+"""
+
+import functools
+import numpy as np
+import scipy.fft
+
+from .instrument import _stage
+from .pyspeckle import _rng
+
+__all__ = (
+    "random_phase_object",
+    "pupil_transfer_function",
+    "image_field",
+    "create_Subjective",
+)
+
+
+def random_phase_object(shape, seed=None):
+    """
+    Create a unit-amplitude object field with uniformly random phase.
+
+    This represents an optically rough surface where the surface height
+    variations are much larger than the wavelength.
+
+    Args:
+        shape: dimensions of the field, e.g., (N, N) or (batch, N, N)
+        seed:  optional seed or `np.random.Generator`
+
+    Returns:
+        complex array of the requested shape
+    """
+    phase = 2 * np.pi * _rng(seed).random(shape)
+    return np.exp(1j * phase)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_pupil(shape, cutoff, pupil, obscuration, defocus):
+    """
+    Compute a read-only pupil transfer function (see `pupil_transfer_function`).
+
+    Args:
+        shape:       (rows, cols) of the grid
+        cutoff:      coherent cutoff frequency [cycles/sample]
+        pupil:       'circular' or 'annular'
+        obscuration: ratio of inner to outer radius for an annular pupil
+        defocus:     defocus aberration W20 at the pupil edge [waves]
+
+    Returns:
+        complex (rows, cols) array in FFT order
+    """
+    fy = scipy.fft.fftfreq(shape[0])[:, np.newaxis]
+    fx = scipy.fft.fftfreq(shape[1])[np.newaxis, :]
+    rho2 = (fx**2 + fy**2) / cutoff**2
+
+    H = (rho2 <= 1).astype(complex)
+    if pupil == "annular":
+        H[rho2 < obscuration**2] = 0
+
+    if defocus:
+        H *= np.exp(2j * np.pi * defocus * rho2)
+
+    H.flags.writeable = False
+    return H
+
+
+def pupil_transfer_function(shape, NA, wavelength, dx, pupil="circular", obscuration=0, defocus=0):
+    """
+    Return the coherent transfer function of an imaging pupil.
+
+    The transfer function passes spatial frequencies up to NA/wavelength
+    and is returned in FFT order (zero frequency at [0, 0]).  The pupil is
+    'circular' or 'annular'; an annular pupil blocks the central fraction
+    `obscuration` of the radius.  Defocus is specified as the wavefront
+    error W20 (in waves) at the edge of the pupil.
+
+    Results are cached, so repeated calls with the same arguments return
+    the same read-only array.
+
+    Args:
+        shape:       (rows, cols) of the object grid
+        NA:          numerical aperture of the imaging lens
+        wavelength:  wavelength of light
+        dx:          object-plane sample spacing
+        pupil:       'circular' or 'annular'
+        obscuration: ratio of inner to outer radius for an annular pupil
+        defocus:     defocus aberration at the pupil edge [waves]
+
+    Returns:
+        complex (rows, cols) array
+    """
+    if NA <= 0:
+        raise ValueError("Numerical aperture NA must be positive.")
+
+    cutoff = NA * dx / wavelength
+    if cutoff > 0.5:
+        raise ValueError(
+            "Object sampling dx=%g is too coarse for NA=%g; need dx <= %g." % (dx, NA, wavelength / NA / 2)
+        )
+
+    lpupil = pupil.lower()
+    if lpupil not in ("circular", "annular"):
+        raise ValueError("pupil must be 'circular' or 'annular'")
+
+    if not 0 <= obscuration < 1:
+        raise ValueError("obscuration must be 0 <= obscuration < 1.")
+
+    shape = tuple(int(n) for n in shape[-2:])
+    return _cached_pupil(shape, float(cutoff), lpupil, float(obscuration), float(defocus))
+
+
+def image_field(obj, NA, wavelength, dx, pupil="circular", obscuration=0, defocus=0, workers=None):
+    """
+    Image an object field through a coherent imaging pupil.
+
+    The object may be a single 2D field or a stack of fields whose last two
+    axes are the image dimensions.  The whole stack is filtered with one
+    forward and one inverse FFT.
+
+    Args:
+        obj:         complex object field(s), shape (..., rows, cols)
+        NA:          numerical aperture of the imaging lens
+        wavelength:  wavelength of light
+        dx:          object-plane sample spacing
+        pupil:       'circular' or 'annular'
+        obscuration: ratio of inner to outer radius for an annular pupil
+        defocus:     defocus aberration at the pupil edge [waves]
+        workers:     number of threads for the FFT (see `scipy.fft`)
+
+    Returns:
+        complex image field(s) with the same shape as obj
+    """
+    obj = np.asarray(obj)
+    if obj.ndim < 2:
+        raise ValueError("Object field must have at least two dimensions.")
+
+    with _stage("image_field", "pupil") as st:
+        H = st.output(pupil_transfer_function(obj.shape, NA, wavelength, dx, pupil, obscuration, defocus))
+
+    with _stage("image_field", "fft") as st:
+        field = st.output(scipy.fft.fft2(obj, workers=workers))
+        field *= H
+
+    with _stage("image_field", "ifft") as st:
+        return st.output(scipy.fft.ifft2(field, overwrite_x=True, workers=workers))
+
+
+def create_Subjective(
+    obj, NA, wavelength, dx, magnification=1, pixel_size=None, pupil="circular", obscuration=0, defocus=0, workers=None
+):
+    """
+    Generate subjective speckle as recorded by a camera.
+
+    The object field(s) are imaged through the pupil (see `image_field()`)
+    and the irradiance is then averaged over each camera pixel.  The camera
+    pixel covers `pixel_size / (magnification * dx)` object samples along
+    each axis; this must be an integer.  When `pixel_size` is omitted each
+    object sample maps onto one pixel.
+
+    The returned irradiance is in the same units as |obj|², so a unit
+    amplitude object produces a pattern whose mean is the fraction of the
+    object spectrum passed by the pupil.
+
+    Args:
+        obj:           complex object field(s), shape (..., rows, cols)
+        NA:            numerical aperture of the imaging lens
+        wavelength:    wavelength of light
+        dx:            object-plane sample spacing
+        magnification: lateral magnification of the imaging system
+        pixel_size:    camera pixel pitch
+        pupil:         'circular' or 'annular'
+        obscuration:   ratio of inner to outer radius for an annular pupil
+        defocus:       defocus aberration at the pupil edge [waves]
+        workers:       number of threads for the FFT (see `scipy.fft`)
+
+    Returns:
+        irradiance array of shape (..., rows // binning, cols // binning)
+    """
+    if magnification <= 0:
+        raise ValueError("Magnification must be positive.")
+
+    if pixel_size is None:
+        pixel_size = magnification * dx
+
+    ratio = pixel_size / (magnification * dx)
+    binning = int(round(ratio))
+    if binning < 1 or abs(ratio - binning) > 1e-6 * ratio:
+        raise ValueError("pixel_size / (magnification * dx) = %g must be a positive integer." % ratio)
+
+    field = image_field(obj, NA, wavelength, dx, pupil, obscuration, defocus, workers)
+
+    with _stage("create_Subjective", "irradiance") as st:
+        irradiance = st.output(field.real**2 + field.imag**2)
+
+    if binning == 1:
+        return irradiance
+
+    with _stage("create_Subjective", "binning") as st:
+        rows = irradiance.shape[-2] // binning
+        cols = irradiance.shape[-1] // binning
+        irradiance = irradiance[..., : rows * binning, : cols * binning]
+        irradiance = irradiance.reshape(irradiance.shape[:-2] + (rows, binning, cols, binning))
+        return st.output(irradiance.mean(axis=(-3, -1)))
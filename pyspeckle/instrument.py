@@ -0,0 +1,216 @@
+# pylint: disable=invalid-name
+
+"""
+Optional timing and memory instrumentation of internal stages.
+
+Every generator and analysis routine is divided into stages (e.g., 'phase',
+'mask', 'exp', 'fft', 'irradiance', and 'normalize' for `create_Exponential`).
+When instrumentation is enabled, a `StageRecord` is produced for each stage
+with its wall time and the size of the array it produced.  When nothing is
+listening, each stage costs only a check of an empty list.
+
+Records are collected with a context manager::
+
+    with pyspeckle.record_stages() as rec:
+        pyspeckle.create_Exponential_3D(64, 4)
+
+    for r in rec.records:
+        print(r.routine, r.stage, r.seconds, r.nbytes)
+
+or by registering a callback that forwards each record elsewhere::
+
+    pyspeckle.add_stage_callback(lambda r: metrics.send(r._asdict()))
+
+Passing `trace_memory=True` to `record_stages()` also reports the peak
+memory allocated during each stage using `tracemalloc`.  This is accurate
+but slows everything down noticeably.
+"""
+
+import collections
+import time
+import tracemalloc
+
+__all__ = (
+    "StageRecord",
+    "record_stages",
+    "add_stage_callback",
+    "remove_stage_callback",
+)
+
+StageRecord = collections.namedtuple(
+    "StageRecord", ["routine", "stage", "seconds", "nbytes", "shape", "dtype", "peak_bytes"]
+)
+StageRecord.__doc__ = """
+Timing and memory used by one stage of a routine.
+
+Attributes:
+    routine:    name of the pyspeckle function
+    stage:      name of the stage within that function
+    seconds:    wall time [s]
+    nbytes:     size of the array produced by the stage [bytes]
+    shape:      shape of the array produced by the stage
+    dtype:      data type of the array produced by the stage
+    peak_bytes: peak memory allocated during the stage (None unless traced)
+"""
+
+_callbacks = []
+_tracing = []
+
+
+def add_stage_callback(callback):
+    """
+    Register a function to be called with every `StageRecord`.
+
+    Args:
+        callback: function accepting a single `StageRecord`
+
+    Returns:
+        nothing
+    """
+    _callbacks.append(callback)
+
+
+def remove_stage_callback(callback):
+    """
+    Unregister a function added with `add_stage_callback()`.
+
+    Args:
+        callback: function previously registered
+
+    Returns:
+        nothing
+    """
+    _callbacks.remove(callback)
+
+
+class _Recorder:
+    """Collect stage records while active (see `record_stages`)."""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            _tracing.append(self)
+        add_stage_callback(self.records.append)
+        return self
+
+    def __exit__(self, *exc):
+        remove_stage_callback(self.records.append)
+        if self.trace_memory:
+            _tracing.remove(self)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        return False
+
+    def as_dicts(self):
+        """Return the records as a list of dictionaries."""
+        return [r._asdict() for r in self.records]
+
+    def totals(self):
+        """Return the total seconds spent in each (routine, stage)."""
+        result = collections.defaultdict(float)
+        for r in self.records:
+            result[(r.routine, r.stage)] += r.seconds
+        return dict(result)
+
+
+def record_stages(trace_memory=False):
+    """
+    Collect a `StageRecord` for every stage run inside a `with` block.
+
+    The returned object has a `records` list as well as `as_dicts()` and
+    `totals()` methods for exporting the results.
+
+    Args:
+        trace_memory: also measure peak memory with `tracemalloc`
+
+    Returns:
+        context manager that collects the records
+    """
+    return _Recorder(trace_memory)
+
+
+class _Stage:
+    """Time one stage and report it to the registered callbacks."""
+
+    __slots__ = ("routine", "stage", "start", "array", "start_bytes")
+
+    def __init__(self, routine, stage):
+        self.routine = routine
+        self.stage = stage
+        self.start = 0.0
+        self.array = None
+        self.start_bytes = None
+
+    def __enter__(self):
+        if _tracing:
+            tracemalloc.reset_peak()
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def output(self, array):
+        """Note the array produced by this stage and return it unchanged."""
+        self.array = array
+        return array
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        peak = None
+        if self.start_bytes is not None and _tracing:
+            peak = tracemalloc.get_traced_memory()[1] - self.start_bytes
+
+        a = self.array
+        record = StageRecord(
+            self.routine,
+            self.stage,
+            seconds,
+            getattr(a, "nbytes", None),
+            getattr(a, "shape", None),
+            str(a.dtype) if hasattr(a, "dtype") else None,
+            peak,
+        )
+        for callback in tuple(_callbacks):
+            callback(record)
+        return False
+
+
+class _NullStage:
+    """Stand-in used when no callbacks are registered."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def output(self, array):
+        """Return the array unchanged."""
+        return array
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _stage(routine, stage):
+    """
+    Return a context manager that times one stage of a routine.
+
+    Args:
+        routine: name of the calling function
+        stage:   name of the stage
+
+    Returns:
+        context manager whose `output()` method notes the resulting array
+    """
+    if _callbacks:
+        return _Stage(routine, stage)
+    return _NULL_STAGE
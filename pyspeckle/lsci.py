@@ -0,0 +1,305 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Convert speckle contrast into correlation times for laser speckle contrast imaging.
+
+The contrast K of speckle integrated over an exposure time T depends on
+the correlation time τc of the moving scatterers through x = T/τc.  With a
+fraction ρ of the light scattered by moving particles, a coherence factor
+β, and a noise variance ν, the contrast is
+
+    K² = β [ρ² A(x) + 2ρ(1-ρ) B(x) + (1-ρ)²] + ν
+
+where A and B are exposure averages of the squared and unsquared field
+correlation functions.  Two velocity models are supported
+
+    'lorentzian'  unordered (Brownian) motion, g1(τ) = exp(-τ/τc)
+    'gaussian'    ordered motion, g1(τ) = exp(-(τ/τc)²)
+
+Inverting K(x) with a root finder for every pixel is slow.  Instead the
+monotone relation is tabulated once (and cached) and every pixel is
+converted by linear interpolation.  The table uses the variable
+log((K - Kmin)/(Kmax - K)), where Kmin and Kmax are the contrasts for very
+long and very short exposures, which keeps both ends of the curve well
+resolved.
+
+The contrast must be the standard deviation divided by the mean over each
+window, as computed by `local_contrast_2D_multiscale()` (or by
+`multi_exposure_contrast()` for a stack of exposures); `local_contrast_2D()`
+uses a different normalization and is not suitable.  For example::
+
+    C = pyspeckle.local_contrast_2D_multiscale(frame, [7])[0]
+    tau = pyspeckle.correlation_time(C, T=5e-3, model="lorentzian", beta=0.8)
+
+see Boas & Dunn, "Laser speckle contrast imaging in biomedical optics,"
+J. Biomed. Opt. 15, 011109 (2010) and Parthasarathy et al., "Robust flow
+measurement with multi-exposure speckle imaging," Opt. Express 16, 1975
+(2008).
+"""
+
+import collections
+import functools
+import math
+import numpy as np
+import scipy.special
+
+from .copula import apply_marginal
+from .instrument import _stage
+
+__all__ = (
+    "ContrastTable",
+    "speckle_contrast",
+    "contrast_table",
+    "correlation_time",
+    "flow_index",
+)
+
+MODELS = ("lorentzian", "gaussian")
+
+ContrastTable = collections.namedtuple("ContrastTable", ["grid", "values", "kmin", "kmax"])
+ContrastTable.__doc__ = """
+Lookup table for converting contrast into correlation time.
+
+Attributes:
+    grid:   uniform grid of log((K - kmin)/(kmax - K))
+    values: log(τc/T) at each grid point
+    kmin:   contrast for an infinitely long exposure
+    kmax:   contrast for an infinitely short exposure
+"""
+
+
+# below this value of u the closed forms lose digits to cancellation and the
+# Taylor series are used instead
+_SERIES_MAX = 0.1
+
+# Taylor coefficients of 2(exp(-u) - 1 + u)/u² in powers of u
+_LORENTZIAN_SERIES = [2 * (-1) ** n / math.factorial(n + 2) for n in range(12)]
+
+# Taylor coefficients of √π erf(u)/u + (exp(-u²) - 1)/u² in powers of u²
+_GAUSSIAN_SERIES = [(-1) ** m / (math.factorial(m) * (2 * m + 1) * (m + 1)) for m in range(8)]
+
+# coefficients of the derivatives with respect to u and u²
+_LORENTZIAN_DERIVATIVE_SERIES = np.polynomial.polynomial.polyder(_LORENTZIAN_SERIES)
+_GAUSSIAN_DERIVATIVE_SERIES = np.polynomial.polynomial.polyder(_GAUSSIAN_SERIES)
+
+
+def _exposure_average(x, a, model):
+    """
+    Return 2/T ∫ (1 - τ/T) g(τ) dτ from 0 to T for g = |g1|**a.
+
+    Args:
+        x:     T/τc (positive array)
+        a:     1 for |g1| or 2 for |g1|²
+        model: 'lorentzian' or 'gaussian'
+
+    Returns:
+        array with the same shape as x
+    """
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if model == "lorentzian":
+            u = a * x
+            closed = 2 * (np.expm1(-u) + u) / u**2
+            series = np.polynomial.polynomial.polyval(u, _LORENTZIAN_SERIES)
+        else:
+            u = np.sqrt(a) * x
+            closed = np.sqrt(np.pi) * scipy.special.erf(u) / u + np.expm1(-(u**2)) / u**2
+            series = np.polynomial.polynomial.polyval(u**2, _GAUSSIAN_SERIES)
+    return np.where(u < _SERIES_MAX, series, closed)
+
+
+def _exposure_average_derivative(x, a, model):
+    """
+    Return the derivative with respect to x of `_exposure_average(x, a, model)`.
+
+    Args:
+        x:     T/τc (positive array)
+        a:     1 for |g1| or 2 for |g1|²
+        model: 'lorentzian' or 'gaussian'
+
+    Returns:
+        array with the same shape as x
+    """
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if model == "lorentzian":
+            u = a * x
+            closed = a * (-2 * np.expm1(-u) / u**2 - 4 * (np.expm1(-u) + u) / u**3)
+            series = a * np.polynomial.polynomial.polyval(u, _LORENTZIAN_DERIVATIVE_SERIES)
+        else:
+            u = np.sqrt(a) * x
+            closed = np.sqrt(a) * (-np.sqrt(np.pi) * scipy.special.erf(u) / u**2 - 2 * np.expm1(-(u**2)) / u**3)
+            series = np.sqrt(a) * 2 * u * np.polynomial.polynomial.polyval(u**2, _GAUSSIAN_DERIVATIVE_SERIES)
+    return np.where(u < _SERIES_MAX, series, closed)
+
+
+def _check(model, beta, rho, nu):
+    """Validate model parameters and return the lower-case model name."""
+    model = model.lower()
+    if model not in MODELS:
+        raise ValueError("model must be 'lorentzian' or 'gaussian'")
+    if beta <= 0 or not 0 < rho <= 1 or nu < 0:
+        raise ValueError("Need beta > 0, 0 < rho <= 1, and nu >= 0.")
+    return model
+
+
+def speckle_contrast(T, tau_c, model="lorentzian", beta=1, rho=1, nu=0):
+    """
+    Calculate the speckle contrast for an exposure time and correlation time.
+
+    This is the forward model that `correlation_time()` inverts.  All
+    arguments broadcast against each other.
+
+    Args:
+        T:     exposure time
+        tau_c: correlation time (same units as T)
+        model: 'lorentzian' or 'gaussian'
+        beta:  coherence factor (1 for ideal sampling of one speckle per pixel)
+        rho:   fraction of light scattered by moving particles
+        nu:    variance from noise and nonergodic contributions
+
+    Returns:
+        contrast K
+    """
+    model = _check(model, np.min(beta), np.min(rho), np.min(nu))
+    x = np.asarray(T, dtype=float) / np.asarray(tau_c, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        A = np.where(x > 0, _exposure_average(x, 2, model), 1.0)
+        B = np.where(x > 0, _exposure_average(x, 1, model), 1.0)
+    K2 = beta * (rho**2 * A + 2 * rho * (1 - rho) * B + (1 - rho) ** 2) + nu
+    return np.sqrt(K2)
+
+
+def _limits(beta, rho, nu):
+    """Return the contrast for infinitely long and short exposures."""
+    return np.sqrt(beta * (1 - rho) ** 2 + nu), np.sqrt(beta + nu)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_table(model, beta, rho, nu, n, xmin, xmax):
+    """Compute a read-only inversion table (see `contrast_table`)."""
+    kmin, kmax = _limits(beta, rho, nu)
+
+    # oversample in x so that the uniform grid is well resolved
+    x = np.geomspace(xmin, xmax, 8 * n)
+    A = _exposure_average(x, 2, model)
+    B = _exposure_average(x, 1, model)
+    K = speckle_contrast(x, 1, model, beta, rho, nu)
+
+    # differences from the limits without cancellation
+    upper = beta * (rho**2 * (1 - A) + 2 * rho * (1 - rho) * (1 - B)) / (kmax + K)
+    lower = beta * (rho**2 * A + 2 * rho * (1 - rho) * B) / (K + kmin)
+    u = np.log(lower) - np.log(upper)
+
+    if np.any(np.diff(u) >= 0) or not np.all(np.isfinite(u)):
+        raise ValueError("Contrast is not strictly decreasing over %g <= T/tau_c <= %g." % (xmin, xmax))
+
+    grid = np.linspace(u[-1], u[0], n)
+    values = np.interp(grid, u[::-1], -np.log(x[::-1]))
+
+    grid.flags.writeable = False
+    values.flags.writeable = False
+    return ContrastTable(grid, values, float(kmin), float(kmax))
+
+
+def contrast_table(model="lorentzian", beta=1, rho=1, nu=0, n=16385, xmin=1e-2, xmax=1e4):
+    """
+    Tabulate the correlation time as a function of speckle contrast.
+
+    The table covers exposure ratios `xmin <= T/τc <= xmax`.  Tables are
+    cached, so repeated calls with the same arguments return the same
+    read-only arrays.
+
+    Args:
+        model: 'lorentzian' or 'gaussian'
+        beta:  coherence factor
+        rho:   fraction of light scattered by moving particles
+        nu:    variance from noise and nonergodic contributions
+        n:     number of points in the table
+        xmin:  smallest T/τc in the table
+        xmax:  largest T/τc in the table
+
+    Returns:
+        a `ContrastTable`
+    """
+    model = _check(model, beta, rho, nu)
+    if n < 2 or not 0 < xmin < xmax:
+        raise ValueError("Need n >= 2 and 0 < xmin < xmax.")
+    return _cached_table(model, float(beta), float(rho), float(nu), int(n), float(xmin), float(xmax))
+
+
+def correlation_time(K, T=1, model="lorentzian", beta=1, rho=1, nu=0, table=None, out=None):
+    """
+    Convert speckle contrast into correlation time for every pixel.
+
+    Any array of contrasts (a single frame or a stack) is converted in
+    cache-sized chunks using a table from `contrast_table()`.  Contrasts
+    outside the range of the table are clamped to its ends and NaN
+    contrasts give NaN.
+
+    Args:
+        K:     array of speckle contrast values (std/mean in each window)
+        T:     exposure time
+        model: 'lorentzian' or 'gaussian'
+        beta:  coherence factor
+        rho:   fraction of light scattered by moving particles
+        nu:    variance from noise and nonergodic contributions
+        table: `ContrastTable` from `contrast_table()` (overrides model, beta, rho, nu)
+        out:   optional C-contiguous float64 array with the same shape as K
+
+    Returns:
+        array of correlation times (same units as T)
+    """
+    if table is None:
+        table = contrast_table(model, beta, rho, nu)
+
+    K = np.asarray(K, dtype=float)
+    scalar = K.ndim == 0 and out is None
+    if out is None:
+        out = np.empty(K.shape)
+
+    with _stage("correlation_time", "lookup") as st:
+        missing = np.isnan(K)
+        u = np.clip(K, table.kmin, table.kmax, out=out)
+        denominator = table.kmax - u
+        u -= table.kmin
+        with np.errstate(divide="ignore", invalid="ignore"):
+            u /= denominator
+            np.log(u, out=u)
+        np.nan_to_num(u, copy=False, nan=table.grid[0], neginf=table.grid[0], posinf=table.grid[-1])
+
+        tau = apply_marginal(u, (table.grid, table.values), out=u)
+        np.exp(tau, out=tau)
+        tau *= T
+        tau[missing] = np.nan
+        st.output(tau)
+
+    # a scalar contrast gives a scalar, like speckle_contrast()
+    return tau[()] if scalar else tau
+
+
+def flow_index(K, T=1, model="lorentzian", beta=1, rho=1, nu=0, table=None, out=None):
+    """
+    Convert speckle contrast into a relative flow index 1/τc.
+
+    See `correlation_time()` for the arguments.
+
+    Args:
+        K:     array of speckle contrast values (std/mean in each window)
+        T:     exposure time
+        model: 'lorentzian' or 'gaussian'
+        beta:  coherence factor
+        rho:   fraction of light scattered by moving particles
+        nu:    variance from noise and nonergodic contributions
+        table: `ContrastTable` from `contrast_table()` (overrides model, beta, rho, nu)
+        out:   optional C-contiguous float64 array with the same shape as K
+
+    Returns:
+        array of flow indices (inverse units of T)
+    """
+    tau = correlation_time(K, T, model, beta, rho, nu, table, out)
+    if np.ndim(tau) == 0 and out is None:
+        return 1 / tau
+    return np.reciprocal(tau, out=tau)
@@ -0,0 +1,300 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Multi-exposure speckle imaging (MESI).
+
+Speckle contrast measured at several exposure times T separates the
+correlation time τc of moving scatterers from the fraction of static
+scattering and from noise.  At every pixel the contrasts are fitted to
+
+    K(T)² = β [ρ² A(T/τc) + 2ρ(1-ρ) B(T/τc) + (1-ρ)²] + ν
+
+(see `speckle_contrast()`) with β fixed by calibration and τc, ρ, and ν
+free.  Fitting one pixel at a time with `scipy.optimize` is very slow, so
+all pixels are fitted together by a vectorized Levenberg-Marquardt solver
+that works on blocks of pixels, optionally on several threads::
+
+    K = pyspeckle.multi_exposure_contrast(frames, 7)
+    fit = pyspeckle.fit_mesi(K, exposures, beta=0.9)
+    plt.imshow(1 / fit.tau_c)
+
+see Parthasarathy et al., "Robust flow measurement with multi-exposure
+speckle imaging," Opt. Express 16, 1975 (2008).
+"""
+
+import collections
+import concurrent.futures
+import os
+import numpy as np
+
+from .instrument import _stage
+from .lsci import _check, _exposure_average, _exposure_average_derivative, correlation_time
+from .pyspeckle import local_contrast_2D_multiscale
+
+__all__ = (
+    "MESIFit",
+    "multi_exposure_contrast",
+    "fit_mesi",
+)
+
+MESIFit = collections.namedtuple("MESIFit", ["tau_c", "rho", "nu", "rms", "iterations"])
+MESIFit.__doc__ = """
+Per-pixel results of a multi-exposure fit.
+
+Attributes:
+    tau_c:      correlation time (same units as the exposure times)
+    rho:        fraction of light scattered by moving particles
+    nu:         variance from noise and nonergodic contributions
+    rms:        root-mean-square contrast residual
+    iterations: number of iterations until convergence
+"""
+
+# log of the smallest allowed fraction of dynamic scattering; ρ is fitted as
+# log ρ because for T << τc only ρ/τc is determined and the valley of equal
+# cost is then a straight line in log τc and log ρ
+_LOG_RHO_MIN = np.log(1e-3)
+
+# log τc may stray this far outside the range of log exposure times
+_LOG_TAU_MARGIN = 10
+
+
+def multi_exposure_contrast(frames, size=7):
+    """
+    Calculate local contrast images for a stack of exposures.
+
+    The contrast in each window is the standard deviation divided by the
+    mean of its pixels, computed for every frame with the summed-area
+    tables of `local_contrast_2D_multiscale()`.  Only windows that lie
+    completely inside the frames are used.
+
+    Args:
+        frames: array of speckle frames (exposures, rows, cols)
+        size:   window size n (for n x n) or (h, w)
+
+    Returns:
+        array of contrasts (exposures, rows-h+1, cols-w+1)
+    """
+    frames = np.asarray(frames, dtype=float)
+    if frames.ndim != 3:
+        raise ValueError("frames must have shape (exposures, rows, cols).")
+
+    return np.stack([local_contrast_2D_multiscale(frame, [size])[0] for frame in frames])
+
+
+def _model(T, p, beta, model):
+    """
+    Evaluate the MESI contrast and its Jacobian for a block of pixels.
+
+    Args:
+        T:     exposure times (n,)
+        p:     parameters (pixels, 3) as log τc, log ρ, ν
+        beta:  coherence factor
+        model: 'lorentzian' or 'gaussian'
+
+    Returns:
+        K (pixels, n) and Jacobian (pixels, n, 3)
+    """
+    tau = np.exp(p[:, 0:1])
+    rho = np.exp(p[:, 1:2])
+    x = T / tau
+
+    A = _exposure_average(x, 2, model)
+    B = _exposure_average(x, 1, model)
+    dA = _exposure_average_derivative(x, 2, model)
+    dB = _exposure_average_derivative(x, 1, model)
+
+    K2 = beta * (rho**2 * A + 2 * rho * (1 - rho) * B + (1 - rho) ** 2) + p[:, 2:3]
+    K = np.sqrt(np.maximum(K2, 1e-300))
+
+    J = np.empty(K.shape + (3,))
+    J[..., 0] = -beta * x * (rho**2 * dA + 2 * rho * (1 - rho) * dB)
+    J[..., 1] = beta * rho * (2 * rho * A + 2 * (1 - 2 * rho) * B - 2 * (1 - rho))
+    J[..., 2] = 1
+    J /= 2 * K[..., np.newaxis]
+    return K, J
+
+
+def _project(p, bounds):
+    """Keep log τc within bounds, ρ in [1e-3, 1], and ν >= 0."""
+    np.clip(p[:, 0], *bounds, out=p[:, 0])
+    np.clip(p[:, 1], _LOG_RHO_MIN, 0, out=p[:, 1])
+    np.maximum(p[:, 2], 0, out=p[:, 2])
+    return p
+
+
+def _held(p, g, bounds):
+    """Return a mask of parameters at a bound with the gradient pointing outward."""
+    lower = (p[:, 0] <= bounds[0], p[:, 1] <= _LOG_RHO_MIN, p[:, 2] <= 0)
+    upper = (p[:, 0] >= bounds[1], p[:, 1] >= 0, np.zeros(len(p), dtype=bool))
+    return (np.stack(lower, axis=1) & (g > 0)) | (np.stack(upper, axis=1) & (g < 0))
+
+
+def _fit_block(K, T, w, p, beta, model, max_iter, tol, bounds):
+    """
+    Fit one block of pixels by Levenberg-Marquardt.
+
+    Args:
+        K:        measured contrasts (pixels, n)
+        T:        exposure times (n,)
+        w:        weights for each exposure (n,)
+        p:        starting parameters (pixels, 3), modified in place
+        beta:     coherence factor
+        model:    'lorentzian' or 'gaussian'
+        max_iter: maximum number of iterations
+        tol:      relative change in parameters or cost that counts as converged
+        bounds:   smallest and largest allowed log τc
+
+    Returns:
+        p, cost, iterations
+    """
+    npix = len(K)
+    lam = np.full(npix, 1e-3)
+    iterations = np.zeros(npix, dtype=int)
+    active = np.arange(npix)
+
+    Km, J = _model(T, p, beta, model)
+    r = (Km - K) * w
+    cost = np.einsum("pn,pn->p", r, r)
+
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+
+        Ja = J[active] * w[:, np.newaxis]
+        ra = r[active]
+        JtJ = np.einsum("pni,pnj->pij", Ja, Ja)
+        g = np.einsum("pni,pn->pi", Ja, ra)
+
+        # parameters that the gradient pushes against a bound stay there
+        held = _held(p[active], g, bounds)
+        g[held] = 0
+        JtJ[held[:, :, np.newaxis] | held[:, np.newaxis, :]] = 0
+
+        # damped normal equations with Marquardt scaling
+        diag = np.einsum("pii->pi", JtJ)
+        A = JtJ.copy()
+        A[:, [0, 1, 2], [0, 1, 2]] += lam[active, np.newaxis] * (diag + 1e-12)
+        try:
+            step = np.linalg.solve(A, -g[..., np.newaxis])[..., 0]
+        except np.linalg.LinAlgError:
+            step = -g / (lam[active, np.newaxis] * (diag + 1e-12) + 1e-12)
+
+        trial = _project(p[active] + step, bounds)
+        step = trial - p[active]
+        Kt, Jt = _model(T, trial, beta, model)
+        rt = (Kt - K[active]) * w
+        ct = np.einsum("pn,pn->p", rt, rt)
+
+        better = ct < cost[active]
+        # in the ρ/τc valley of nearly static pixels the cost barely changes
+        flat = cost[active] - ct <= tol * cost[active]
+        idx = active[better]
+        p[idx] = trial[better]
+        J[idx] = Jt[better]
+        r[idx] = rt[better]
+        cost[idx] = ct[better]
+        iterations[active] += 1
+
+        lam[idx] /= 10
+        lam[active[~better]] *= 10
+
+        small = np.max(np.abs(step), axis=1) <= tol * (1 + np.max(np.abs(trial), axis=1))
+        done = (better & (small | flat)) | (lam[active] > 1e10)
+        active = active[~done]
+
+    return p, cost, iterations
+
+
+def fit_mesi(K, T, beta=1, model="lorentzian", weights=None, max_iter=100, tol=1e-8, chunk=1 << 15, workers=None):
+    """
+    Fit the MESI model to multi-exposure contrast at every pixel.
+
+    `K` has the exposures along its first axis and any shape after that,
+    e.g., (exposures, rows, cols) from `multi_exposure_contrast()`.  The
+    starting correlation time for each pixel is found by inverting the
+    contrast at the middle exposure (see `correlation_time()`).
+
+    Pixels are fitted in blocks of `chunk` pixels.  With `workers` greater
+    than one the blocks are distributed over a thread pool; numpy releases
+    the GIL in the heavy operations so this uses several cores.
+
+    Args:
+        K:        contrasts (exposures, ...)
+        T:        exposure times (exposures,)
+        beta:     coherence factor (from calibration)
+        model:    'lorentzian' or 'gaussian'
+        weights:  weight of each exposure in the least-squares fit (None for equal)
+        max_iter: maximum number of Levenberg-Marquardt iterations
+        tol:      relative change in parameters or cost that counts as converged
+        chunk:    number of pixels fitted together
+        workers:  number of threads (None for the number of processors)
+
+    Returns:
+        a `MESIFit` whose arrays have the shape of one contrast image
+    """
+    model = _check(model, beta, 1, 0)
+    K = np.asarray(K, dtype=float)
+    T = np.asarray(T, dtype=float)
+    if K.ndim < 1 or T.shape != K.shape[:1]:
+        raise ValueError("K must have one contrast image for each exposure time.")
+
+    if len(T) < 3:
+        raise ValueError("At least three exposure times are needed to fit three parameters.")
+
+    w = np.ones_like(T) if weights is None else np.asarray(weights, dtype=float)
+    if w.shape != T.shape:
+        raise ValueError("weights must have one value per exposure time.")
+
+    if np.any(T <= 0):
+        raise ValueError("Exposure times must be positive.")
+
+    # keep T/τc finite so that LM steps cannot overflow
+    bounds = (np.log(np.min(T)) - _LOG_TAU_MARGIN, np.log(np.max(T)) + _LOG_TAU_MARGIN)
+
+    shape = K.shape[1:]
+    Kp = np.ascontiguousarray(K.reshape(len(T), -1).T)
+    npix = len(Kp)
+
+    with _stage("fit_mesi", "start") as st:
+        middle = np.argsort(T)[len(T) // 2]
+        p = np.empty((npix, 3))
+        p[:, 0] = np.log(correlation_time(np.nan_to_num(Kp[:, middle]), T[middle], model, beta))
+        # the longest exposure is dominated by the static fraction
+        static = np.sqrt(np.clip(Kp[:, np.argmax(T)] ** 2 / beta, 0, 1))
+        with np.errstate(divide="ignore"):
+            p[:, 1] = np.nan_to_num(np.log(1 - static), neginf=_LOG_RHO_MIN)
+        p[:, 2] = 0
+        _project(p, bounds)
+        st.output(p)
+
+    cost = np.empty(npix)
+    iterations = np.empty(npix, dtype=int)
+
+    def fit(start):
+        stop = min(start + chunk, npix)
+        pb, cb, ib = _fit_block(Kp[start:stop], T, w, p[start:stop], beta, model, max_iter, tol, bounds)
+        p[start:stop] = pb
+        cost[start:stop] = cb
+        iterations[start:stop] = ib
+
+    starts = range(0, npix, chunk)
+    with _stage("fit_mesi", "fit") as st:
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(starts) == 1:
+            for start in starts:
+                fit(start)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+                list(pool.map(fit, starts))
+        st.output(p)
+
+    rms = np.sqrt(cost / np.sum(w**2))
+    return MESIFit(
+        np.exp(p[:, 0]).reshape(shape),
+        np.exp(p[:, 1]).reshape(shape),
+        p[:, 2].reshape(shape),
+        rms.reshape(shape),
+        iterations.reshape(shape),
+    )
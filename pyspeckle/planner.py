@@ -0,0 +1,386 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Estimate the cost of speckle generation and contrast calculations.
+
+The cost of `create_Exponential` and `create_Exponential_3D` is dominated by
+the FFT grid, which is roughly `pix_per_speckle` times larger than the output
+along every axis.  The planner estimates the peak memory, the number of
+floating point operations, and a rough run time for each way of doing the
+calculation and picks the fastest one that fits inside a memory budget.
+
+The engines for generation are
+
+    'full'    zero-pad the pupil to the whole grid and do one n-D FFT
+    'pruned'  transform one axis at a time, zero-padding only along that
+              axis and keeping only the output samples that are needed
+    'zoom'    evaluate only the needed output samples with a chirp-z
+              transform of the pupil along each axis; no padded grid is
+              used, so the cost depends on the output and pupil sizes but
+              not on `pix_per_speckle`
+
+All engines produce identical speckle for the same random phases.  Each
+engine can be run in 'double' or 'single' precision and with several FFT
+threads.  For example::
+
+    plan = pyspeckle.plan_Exponential(128, 4, ndim=3)
+    print(plan.engine, plan.peak_bytes / 2**30, plan.seconds)
+
+    x = pyspeckle.create_Exponential_3D(128, 4, max_memory=2 * 2**30)
+
+The run time estimates use nominal processor and memory speeds and are only
+useful for comparing alternatives.
+"""
+
+import collections
+import os
+import numpy as np
+import scipy.fft
+
+__all__ = (
+    "Plan",
+    "plan_Exponential",
+    "plan_contrast",
+)
+
+Plan = collections.namedtuple(
+    "Plan", ["routine", "engine", "precision", "workers", "grid", "peak_bytes", "flops", "seconds"]
+)
+Plan.__doc__ = """
+Estimated cost of one way to do a calculation.
+
+Attributes:
+    routine:    name of the pyspeckle function
+    engine:     algorithm used (e.g., 'full', 'pruned', 'zoom', 'direct', 'fft')
+    precision:  'double' or 'single'
+    workers:    number of FFT threads
+    grid:       size of the FFT grid along each axis
+    peak_bytes: estimated peak memory [bytes]
+    flops:      estimated floating point operations
+    seconds:    rough estimate of the run time [s]
+"""
+
+ENGINES = ("full", "pruned", "zoom")
+
+# nominal single-thread FFT speed and memory bandwidth used for run times
+_FLOPS_PER_SECOND = 2e9
+_BYTES_PER_SECOND = 5e9
+
+# problems smaller than this many flops are not worth threading
+_THREAD_FLOPS = 1e8
+
+
+def _speckle_sizes(pix_per_speckle, alpha=1, beta=1, ndim=2, shape="ellipse"):
+    """
+    Return the speckle size along each axis of the output array.
+
+    For 2D arrays the axes are (rows, cols) = (y, x) and for 3D arrays
+    they are (x, y, z), matching `create_Exponential` and
+    `create_Exponential_3D`.
+
+    Annular and shell pupils have a circular outer edge, so their speckle
+    is the same size along every axis; `alpha` and `beta` only set the
+    obscuration (see `_obscuration()`).
+
+    Args:
+        pix_per_speckle: number of pixels per smallest speckle
+        alpha:           ratio of x to y speckle size
+        beta:            ratio of x to z speckle size
+        ndim:            2 or 3
+        shape:           name of the pupil shape
+
+    Returns:
+        tuple of speckle sizes [pixels]
+    """
+    if shape.lower() in ("annulus", "shell"):
+        return (pix_per_speckle,) * ndim
+
+    if ndim == 2:
+        sx = pix_per_speckle * max(1, alpha)
+        return (sx / alpha, sx)
+
+    sx = pix_per_speckle * max(1, alpha, beta)
+    return (sx, sx / alpha, sx / beta)
+
+
+def _obscuration(alpha=1, beta=1, ndim=2):
+    """
+    Return the ratio of the inner to the outer radius of an annular or shell pupil.
+
+    The radii are proportional to 1, `alpha` (and `beta` in 3D); the
+    largest sets the outer edge and the smallest the inner edge.
+
+    Args:
+        alpha: relative radius along y
+        beta:  relative radius along z (3D only)
+        ndim:  2 or 3
+
+    Returns:
+        obscuration ratio between 0 and 1
+    """
+    radii = (1, alpha) if ndim == 2 else (1, alpha, beta)
+    return min(radii) / max(radii)
+
+
+def _grid_sizes(dims, speckle_sizes):
+    """
+    Choose FFT grid sizes and pupil radii for each axis.
+
+    Each grid is at least `speckle_size * dim` long and rounded up to a size
+    that `scipy.fft` transforms efficiently.  The pupil diameter is then the
+    grid size divided by the speckle size so that the speckle size is exact.
+
+    Args:
+        dims:          output size along each axis [pixels]
+        speckle_sizes: speckle size along each axis [pixels]
+
+    Returns:
+        tuple of grid sizes, tuple of pupil radii
+    """
+    L = tuple(scipy.fft.next_fast_len(int(np.ceil(s * n - 1e-9))) for n, s in zip(dims, speckle_sizes))
+    radii = tuple(n / s / 2 for n, s in zip(L, speckle_sizes))
+    return L, radii
+
+
+def _support(L, radii):
+    """
+    Return the size of the corner of the grid that contains the pupil.
+
+    Args:
+        L:     grid size along each axis
+        radii: pupil radius along each axis
+
+    Returns:
+        tuple of support sizes
+    """
+    return tuple(min(n, int(np.ceil(2 * r))) for n, r in zip(L, radii))
+
+
+def _fft_flops(n, length):
+    """Return the flops for n complex 1D transforms of the given length."""
+    return 5 * n * length * np.log2(max(length, 2))
+
+
+def _estimate(routine, engine, precision, workers, dims, L, support, copies):
+    """
+    Estimate peak memory, flops, and run time of one generation engine.
+
+    Args:
+        routine:   name of the pyspeckle function
+        engine:    'full', 'pruned', or 'zoom'
+        precision: 'double' or 'single'
+        workers:   number of FFT threads
+        dims:      output size along each axis
+        L:         FFT grid size along each axis
+        support:   size of the pupil corner along each axis
+        copies:    number of independent patterns summed (2 if partially polarized)
+
+    Returns:
+        a `Plan`
+    """
+    c = 16 if precision == "double" else 8
+    f = c // 2
+    n_support = int(np.prod(support))
+    n_out = int(np.prod(dims))
+
+    # phases, mask, and complex pupil field
+    start = n_support * (8 + 1 + c)
+
+    if engine == "full":
+        n_grid = int(np.prod(L))
+        flops = _fft_flops(1, n_grid)
+        # padded grid plus FFT workspace
+        fft_bytes = 2 * c * n_grid
+        traffic = 4 * c * n_grid
+    elif engine == "zoom":
+        flops = 0
+        fft_bytes = 0
+        traffic = 0
+        before = list(support)
+        for axis, (n, s) in enumerate(zip(dims, support)):
+            nfft = scipy.fft.next_fast_len(n + s - 1)
+            count = int(np.prod(before)) // s
+            after = before[:axis] + [n] + before[axis + 1 :]
+            # forward and inverse FFTs plus three chirp multiplications
+            flops += 2 * _fft_flops(count, nfft) + 18 * count * nfft
+            fft_bytes = max(fft_bytes, c * (int(np.prod(before)) + 2 * count * nfft + int(np.prod(after))))
+            traffic += 6 * c * count * nfft
+            before = after
+    else:
+        flops = 0
+        fft_bytes = 0
+        traffic = 0
+        before = list(support)
+        for axis, (n, Ln) in enumerate(zip(dims, L)):
+            padded = before[:axis] + [Ln] + before[axis + 1 :]
+            after = before[:axis] + [n] + before[axis + 1 :]
+            n_padded = int(np.prod(padded))
+            flops += _fft_flops(n_padded // Ln, Ln)
+            fft_bytes = max(fft_bytes, c * (int(np.prod(before)) + 2 * n_padded + int(np.prod(after))))
+            traffic += 4 * c * n_padded
+            before = after
+
+    # corner of the transform, irradiance, and normalized result
+    finish = n_out * (c + 2 * f)
+    peak = start + max(fft_bytes, finish)
+    if copies > 1:
+        peak += copies * n_out * f
+
+    seconds = copies * (flops / (_FLOPS_PER_SECOND * workers**0.8) + (traffic + finish) / _BYTES_PER_SECOND)
+    return Plan(routine, engine, precision, workers, tuple(L), int(peak), float(copies * flops), float(seconds))
+
+
+def _choose(candidates, max_memory, description):
+    """
+    Pick the fastest plan that fits in memory or raise an error.
+
+    Args:
+        candidates:  list of `Plan`
+        max_memory:  memory budget in bytes (None for no limit)
+        description: text describing the request for the error message
+
+    Returns:
+        the chosen `Plan`
+    """
+    fits = [p for p in candidates if max_memory is None or p.peak_bytes <= max_memory]
+    if not fits:
+        smallest = min(candidates, key=lambda p: p.peak_bytes)
+        raise MemoryError(
+            "%s needs at least %.3g GiB (engine '%s', %s precision) but max_memory is %.3g GiB."
+            % (description, smallest.peak_bytes / 2**30, smallest.engine, smallest.precision, max_memory / 2**30)
+        )
+    return min(fits, key=lambda p: (p.seconds, p.peak_bytes))
+
+
+def plan_Exponential(
+    M,
+    pix_per_speckle,
+    alpha=1,
+    beta=1,
+    ndim=2,
+    shape="ellipse",
+    polarization=1,
+    engine="auto",
+    precision="double",
+    max_memory=None,
+    workers=None,
+):
+    """
+    Estimate the cost of `create_Exponential` or `create_Exponential_3D`.
+
+    Every combination of engine and precision that is allowed by the
+    arguments is estimated and the fastest one whose peak memory fits in
+    `max_memory` is returned.  A `MemoryError` describing the smallest
+    possible footprint is raised when nothing fits.
+
+    `precision='auto'` allows single precision to be used when double
+    precision does not fit.
+
+    Args:
+        M:               output size (integer or tuple); a 3-tuple implies ndim=3
+        pix_per_speckle: number of pixels per smallest speckle
+        alpha:           ratio of x to y speckle size
+        beta:            ratio of x to z speckle size (3D only)
+        ndim:            2 or 3
+        shape:           pupil shape
+        polarization:    degree of polarization (two patterns are needed if < 1)
+        engine:          'auto', 'full', 'pruned', or 'zoom'
+        precision:       'double', 'single', or 'auto'
+        max_memory:      memory budget [bytes] or None
+        workers:         number of FFT threads (None to choose automatically)
+
+    Returns:
+        the chosen `Plan`
+    """
+    if not np.isscalar(M):
+        ndim = len(M)
+    if ndim not in (2, 3):
+        raise ValueError("ndim must be 2 or 3.")
+    dims = (M,) * ndim if np.isscalar(M) else tuple(M)
+
+    if engine not in ("auto",) + ENGINES:
+        raise ValueError("engine must be 'auto', 'full', 'pruned', or 'zoom'")
+
+    if precision not in ("auto", "double", "single"):
+        raise ValueError("precision must be 'auto', 'double', or 'single'")
+
+    L, radii = _grid_sizes(dims, _speckle_sizes(pix_per_speckle, alpha, beta, ndim, shape))
+    support = _support(L, radii)
+    routine = "create_Exponential" if ndim == 2 else "create_Exponential_3D"
+    copies = 1 if polarization >= 1 else 2
+
+    engines = ENGINES if engine == "auto" else (engine,)
+    precisions = ("double", "single") if precision == "auto" else (precision,)
+
+    candidates = []
+    for p in precisions:
+        for e in engines:
+            plan = _estimate(routine, e, p, 1, dims, L, support, copies)
+            if workers is None and plan.flops > _THREAD_FLOPS:
+                plan = _estimate(routine, e, p, os.cpu_count() or 1, dims, L, support, copies)
+            elif workers is not None:
+                plan = _estimate(routine, e, p, workers, dims, L, support, copies)
+            candidates.append(plan)
+
+        # only fall back to single precision if double does not fit
+        if precision == "auto" and any(max_memory is None or c.peak_bytes <= max_memory for c in candidates):
+            break
+
+    description = "%s(%s, %g)" % (routine, "x".join(str(n) for n in dims), pix_per_speckle)
+    return _choose(candidates, max_memory, description)
+
+
+def plan_contrast(shape, kernel, max_memory=None):
+    """
+    Estimate the cost of `local_contrast_2D` for an image and kernel.
+
+    The two convolutions can be done directly or with FFTs.  Direct
+    convolution is cheaper for small kernels; FFT convolution wins for
+    large ones.
+
+    Args:
+        shape:      (rows, cols) of the speckle image
+        kernel:     2D kernel array or its (rows, cols)
+        max_memory: memory budget [bytes] or None
+
+    Returns:
+        the chosen `Plan` (engine is 'direct' or 'fft')
+    """
+    rows, cols = shape
+    kshape = np.shape(kernel) if np.ndim(kernel) == 2 else tuple(kernel)
+    n = rows * cols
+    nk = int(np.prod(kshape))
+
+    # image, mean, squared deviation, variance, and contrast arrays
+    base = 5 * 8 * n
+
+    direct_flops = 2 * 2 * n * nk
+    direct = Plan(
+        "local_contrast_2D",
+        "direct",
+        "double",
+        1,
+        (rows, cols),
+        base,
+        float(direct_flops),
+        direct_flops / _FLOPS_PER_SECOND + base / _BYTES_PER_SECOND,
+    )
+
+    grid = tuple(scipy.fft.next_fast_len(a + b - 1, real=True) for a, b in zip((rows, cols), kshape))
+    n_grid = grid[0] * grid[1]
+    fft_flops = 2 * 3 * _fft_flops(1, n_grid) / 2
+    fft_bytes = base + 3 * 16 * n_grid // 2
+    fft = Plan(
+        "local_contrast_2D",
+        "fft",
+        "double",
+        1,
+        grid,
+        fft_bytes,
+        float(fft_flops),
+        float(fft_flops / _FLOPS_PER_SECOND + 3 * fft_bytes / _BYTES_PER_SECOND),
+    )
+
+    return _choose([direct, fft], max_memory, "local_contrast_2D(%dx%d, %dx%d)" % (rows, cols, *kshape))
@@ -0,0 +1,132 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Speckle produced by a broadband source.
+
+Each wavelength in the source spectrum produces its own speckle pattern.
+Longer wavelengths make larger speckles because the far-field angle scales
+with wavelength, and they see a smaller phase from the same surface height.
+The recorded pattern is the sum of the irradiance of all the spectral
+components.
+
+All wavelengths share one random surface-height screen in the pupil.  The
+far field of each wavelength is evaluated on a common detector grid with a
+chirp-z (zoom) transform over the pupil support only, so no wavelength
+needs its own differently padded FFT.  Wavelengths are processed in
+batches and their irradiance is accumulated in place.  For example::
+
+    wavelengths = np.linspace(0.60, 0.66, 31)
+    x = pyspeckle.create_Polychromatic(512, 4, wavelengths, roughness=5)
+
+The detector grid is centered on the optical axis so that the speckle grows
+radially with wavelength about the center of the image.
+"""
+
+import numpy as np
+
+from .instrument import _stage
+from .planner import _obscuration, _speckle_sizes
+from .pyspeckle import _create_mask, _rng, _zoom_far_field
+
+__all__ = ("create_Polychromatic",)
+
+
+def create_Polychromatic(
+    M,
+    pix_per_speckle,
+    wavelengths,
+    weights=None,
+    center=None,
+    roughness=1,
+    alpha=1,
+    shape="ellipse",
+    batch=4,
+    seed=None,
+    workers=None,
+):
+    """
+    Generate speckle irradiance from a broadband source.
+
+    The surface heights in the pupil are normally distributed with a
+    standard deviation of `roughness` times the `center` wavelength, so the
+    phase at wavelength λ is 4π h/λ.  A roughness well above 1/4 gives fully
+    developed speckle at every wavelength; a larger roughness makes the
+    speckle decorrelate faster with wavelength and lowers the contrast of
+    the sum.
+
+    The speckle size is `pix_per_speckle` at the `center` wavelength (by
+    default the weighted mean wavelength) and scales in proportion to the
+    wavelength.  `pix_per_speckle` need not be an integer.
+
+    The cost grows linearly with the number of wavelengths.  Each batch
+    needs about `batch * 2 * M * M` complex values of working memory.
+
+    Args:
+        M:               dimension of desired square speckle image or (rows, cols)
+        pix_per_speckle: number of pixels per smallest speckle at the center wavelength
+        wavelengths:     array of wavelengths in the source spectrum
+        weights:         relative power at each wavelength (None for equal)
+        center:          wavelength at which the speckle size is pix_per_speckle
+        roughness:       RMS surface height [center wavelengths]
+        alpha:           ratio of horizontal to vertical speckle size (obscuration of an annulus)
+        shape:           'ellipse', 'rectangle', or 'annulus'
+        batch:           number of wavelengths transformed at once
+        seed:            optional seed or `np.random.Generator`
+        workers:         number of FFT threads (see `scipy.fft`)
+
+    Returns:
+        M x M (or rows x cols) speckle image with maximum value 1
+    """
+    rows, cols = (M, M) if np.isscalar(M) else M
+    wavelengths = np.atleast_1d(np.asarray(wavelengths, dtype=float))
+
+    if np.any(wavelengths <= 0):
+        raise ValueError("Wavelengths must be positive.")
+
+    if weights is None:
+        weights = np.ones_like(wavelengths)
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape != wavelengths.shape or np.any(weights < 0) or not np.any(weights > 0):
+        raise ValueError("weights must be non-negative with one value per wavelength.")
+    weights = weights / np.sum(weights)
+
+    if center is None:
+        center = np.sum(weights * wavelengths)
+
+    if batch < 1:
+        raise ValueError("batch must be at least 1.")
+
+    routine = "create_Polychromatic"
+    sy, sx = _speckle_sizes(pix_per_speckle, alpha, shape=shape)
+    obscuration = _obscuration(alpha)
+
+    # surface heights in units of the center wavelength
+    with _stage(routine, "height") as st:
+        height = st.output(roughness * _rng(seed).standard_normal((rows, cols)))
+
+    with _stage(routine, "mask") as st:
+        mask = st.output(_create_mask((rows, cols), cols / 2, rows / 2, shape=shape, obscuration=obscuration))
+
+    out = np.zeros((rows, cols))
+    with _stage(routine, "zoom") as st:
+        for i in range(0, len(wavelengths), batch):
+            ratio = center / wavelengths[i : i + batch, np.newaxis]
+
+            # spectral components share the height screen but see different phases
+            field = np.exp(4j * np.pi * ratio[..., np.newaxis] * height) * mask
+
+            # the far-field frequency of a detector pixel scales as 1/wavelength
+            steps = (ratio / (sy * rows), ratio / (sx * cols))
+            starts = (-(rows // 2) * steps[0], -(cols // 2) * steps[1])
+            E = _zoom_far_field(field, (rows, cols), steps, starts, workers)
+
+            w = weights[i : i + batch, np.newaxis, np.newaxis]
+            out += np.einsum("bij,bij->ij", w * E.real, E.real)
+            out += np.einsum("bij,bij->ij", w * E.imag, E.imag)
+        st.output(out)
+
+    with _stage(routine, "normalize") as st:
+        out /= np.max(out) or 1
+        return st.output(out)
@@ -13,18 +13,25 @@ Documentation and examples are available at <https://pyspeckle2.readthedocs.io>
 """
 
 import copy
+import functools
+import scipy.fft
 import scipy.signal
-import scipy.stats
+import scipy.special
 import numpy as np
 import matplotlib.cm
 import matplotlib.pyplot as plt
 
+from .instrument import _stage
+from .planner import _grid_sizes, _obscuration, _speckle_sizes, _support, plan_Exponential, plan_contrast
+
 __all__ = (
     "create_exp_1D",
     "create_gaussian_1D",
+    "create_gaussian_field",
     "autocorrelation",
     "local_contrast_2D",
     "local_contrast_2D_plot",
+    "local_contrast_2D_multiscale",
     "create_Exponential",
     "create_Rayleigh",
     "statistics_plot",
@@ -48,7 +55,7 @@ def _sqrt_matrix(x):
     return y.astype(int)
 
 
-def local_contrast_2D(x, kernel):
+def local_contrast_2D(x, kernel, xp=None, device=None):
     """
     Calculate local (2D) spatial contrast and determine first-order statistics.
 
@@ -60,22 +67,59 @@ def local_contrast_2D(x, kernel):
     the speckle pattern as only valid pixels resulting from the convolution are
     returned.
 
+    Arrays from any array API library (e.g., `jax.numpy`) are accepted and the
+    calculation is done in that library using FFT correlation.  Passing `xp`
+    (and optionally `device`) converts numpy input to that library.
+
     Args:
         x: 2D speckle pattern
         kernel: 2D region over which contrast is to be calculated
+        xp: array namespace (None to use the namespace of x)
+        device: device for the calculation in namespace xp
 
     Returns:
         2D_contrast_image, total_contrast
     """
+    xp = _namespace(x, xp=xp)
+    if xp is not np:
+        x = _asarray(xp, x, device=device)
+        kernel = xp.astype(_asarray(xp, kernel, device=device), x.dtype)
+        Nk = xp.sum(kernel)
+        K = xp.std(x) / xp.mean(x)
+        mu_x = _correlate_same(xp, x, kernel) / Nk
+        var_x = _correlate_same(xp, (x - mu_x) ** 2, kernel) / Nk / Nk
+        var_x = xp.maximum(var_x, xp.zeros_like(var_x))
+        return xp.sqrt(var_x) / mu_x, K
+
     # normalization total for kernel
     Nk = np.sum(kernel)
     # contrast of raw image
-    K = np.std(x) / np.mean(x)
+    with _stage("local_contrast_2D", "global"):
+        K = np.std(x) / np.mean(x)
+
+    # direct or FFT correlation, whichever is expected to be faster
+    if plan_contrast(np.shape(x), kernel).engine == "fft":
+        flipped = np.asarray(kernel)[::-1, ::-1]
+        r0, c0 = flipped.shape[0] // 2, flipped.shape[1] // 2
+
+        def correlate(a):
+            # same alignment as correlate2d(mode="same") for even kernels too
+            full = scipy.signal.fftconvolve(a, flipped, mode="full")
+            return full[r0 : r0 + a.shape[0], c0 : c0 + a.shape[1]]
+
+    else:
+
+        def correlate(a):
+            return scipy.signal.correlate2d(a, kernel, mode="same")
 
     # local speckle contrast
-    mu_x = scipy.signal.correlate2d(x, kernel, mode="same") / Nk
-    var_x = scipy.signal.correlate2d((x - mu_x) ** 2, kernel, mode="same") / Nk / Nk
-    C = np.sqrt(var_x) / mu_x
+    with _stage("local_contrast_2D", "mean") as st:
+        mu_x = st.output(correlate(x) / Nk)
+    with _stage("local_contrast_2D", "variance") as st:
+        var_x = st.output(correlate((x - mu_x) ** 2) / Nk / Nk)
+        np.maximum(var_x, 0, out=var_x)
+    with _stage("local_contrast_2D", "contrast") as st:
+        C = st.output(np.sqrt(var_x) / mu_x)
     return C, K
 
 
@@ -129,9 +173,100 @@ def local_contrast_2D_plot(x, kernel):
     plt.ylabel("PDF")
 
 
-def _create_mask(M, x_radius, y_radius, shape="ellipse"):
+def _summed_area_table(x):
+    """
+    Create a summed-area table with a leading row and column of zeros.
+
+    The sum of `x[i:i+h, j:j+w]` is `S[i+h, j+w] - S[i, j+w] - S[i+h, j] + S[i, j]`.
+
+    Args:
+        x: 2D array
+
+    Returns:
+        (rows+1) x (cols+1) array of cumulative sums
     """
-    Create a MxM boolean mask for a particular beam shape.
+    S = np.zeros((x.shape[0] + 1, x.shape[1] + 1))
+    np.cumsum(x, axis=0, out=S[1:, 1:])
+    np.cumsum(S[1:, 1:], axis=1, out=S[1:, 1:])
+    return S
+
+
+def _window_sums(S, h, w):
+    """
+    Sum over every h x w window using a summed-area table.
+
+    Args:
+        S: summed-area table from `_summed_area_table()`
+        h: window height in pixels
+        w: window width in pixels
+
+    Returns:
+        2D array of window sums (valid windows only)
+    """
+    return S[h:, w:] - S[:-h, w:] - S[h:, :-w] + S[:-h, :-w]
+
+
+def local_contrast_2D_multiscale(x, sizes, average=False):
+    """
+    Calculate local (2D) spatial contrast for many window sizes at once.
+
+    Summed-area tables of the irradiance and of its square are built once and
+    then every window sum costs four lookups, independent of the window size.
+    This makes it cheap to produce curves of contrast versus window size.
+
+    Each entry of `sizes` is either an integer `n` for an n x n window or a
+    tuple `(h, w)` for an h x w window.  Only windows that lie completely
+    inside the image are used, so a window of size h x w produces a
+    contrast map with dimensions `(rows-h+1, cols-w+1)`.
+
+    The contrast in each window is the standard deviation divided by the
+    mean of the pixels in that window.
+
+    Args:
+        x:       2D speckle pattern
+        sizes:   list of window sizes
+        average: if True, return the average contrast for each window size
+
+    Returns:
+        list of 2D contrast images or, if `average` is True, an array of mean contrasts
+    """
+    x = np.asarray(x, dtype=float)
+    if x.ndim != 2:
+        raise ValueError("Speckle pattern x must be a 2D array.")
+
+    # subtracting the mean avoids catastrophic cancellation in var = <x^2> - <x>^2
+    with _stage("local_contrast_2D_multiscale", "tables") as st:
+        offset = np.mean(x)
+        xc = x - offset
+        S1 = _summed_area_table(xc)
+        S2 = st.output(_summed_area_table(xc * xc))
+
+    result = []
+    for size in sizes:
+        h, w = (size, size) if np.isscalar(size) else size
+        h, w = int(h), int(w)
+        if h < 1 or w < 1 or h > x.shape[0] or w > x.shape[1]:
+            raise ValueError("Window size %s does not fit inside the %d x %d image." % (str(size), *x.shape))
+
+        n = h * w
+        with _stage("local_contrast_2D_multiscale", "window %dx%d" % (h, w)) as st:
+            mu = _window_sums(S1, h, w) / n
+            var = _window_sums(S2, h, w) / n - mu * mu
+            np.maximum(var, 0, out=var)
+            mu += offset
+            with np.errstate(divide="ignore", invalid="ignore"):
+                C = st.output(np.sqrt(var) / mu)
+
+        result.append(np.nanmean(C) if average else C)
+
+    if average:
+        return np.array(result)
+    return result
+
+
+def _create_mask(M, x_radius, y_radius, shape="ellipse", obscuration=None):
+    """
+    Create a MxM (or rows x cols) boolean mask for a particular beam shape.
 
     The resulting shape is in the top left corner of the the returned array.
 
@@ -152,21 +287,25 @@ def _create_mask(M, x_radius, y_radius, shape="ellipse"):
     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
 
     When shape is 'annulus' then the outer circle radius is the max(x_radius, y_radius)
-    and then inner radius is the other.
+    and then inner radius is the other.  If `obscuration` is given then the
+    outer edge is the ellipse with radii x_radius and y_radius and the inner
+    edge is the same ellipse scaled by `obscuration`.
 
     Args:
-        M:        dimension of desired image
-        x_radius: half the horizontal width of the ellipse (in pixels)
-        y_radius: half the vertical width of the ellipse (in pixels)
-        shape:    'ellipse', 'rectangle', or 'annulus' describing the laser shape
+        M:           dimension of desired image or (rows, cols)
+        x_radius:    half the horizontal width of the ellipse (in pixels)
+        y_radius:    half the vertical width of the ellipse (in pixels)
+        shape:       'ellipse', 'rectangle', or 'annulus' describing the laser shape
+        obscuration: ratio of inner to outer radius of an annulus
 
     Returns:
-        M x M boolean array
+        M x M (or rows x cols) boolean array
     """
-    if M < 2 * max(x_radius, y_radius):
+    rows, cols = (M, M) if np.isscalar(M) else M
+    if cols < 2 * x_radius or rows < 2 * y_radius:
         raise ValueError("Array size M must be at least twice the radius.")
 
-    Y, X = np.ogrid[:M, :M]
+    Y, X = np.ogrid[:rows, :cols]
 
     lshape = shape.lower()
 
@@ -175,6 +314,10 @@ def _create_mask(M, x_radius, y_radius, shape="ellipse"):
         mask2 = Y < 2 * y_radius
         mask = np.logical_and(mask2, mask1)
 
+    elif lshape == "annulus" and obscuration is not None:
+        dist = np.sqrt((X - x_radius) ** 2 / x_radius**2 + (Y - y_radius) ** 2 / y_radius**2)
+        mask = np.logical_and(dist > obscuration, dist <= 1)
+
     elif lshape == "annulus":
         rmax = max(x_radius, y_radius)
         rmin = min(x_radius, y_radius)
@@ -227,12 +370,14 @@ def create_exp_1D(M, mean, stdev, cl):
     fsqrt = np.sqrt(1 - f * f)
 
     # gaussian deviates with mean=0 and variance=1
-    g = np.random.normal(size=M)
-    r = np.zeros(M)
+    with _stage("create_exp_1D", "random") as st:
+        g = st.output(np.random.normal(size=M))
 
-    r[0] = g[0]
-    for i in range(1, M):
-        r[i] = f * r[i - 1] + fsqrt * g[i]
+    with _stage("create_exp_1D", "recursion") as st:
+        r = st.output(np.zeros(M))
+        r[0] = g[0]
+        for i in range(1, M):
+            r[i] = f * r[i - 1] + fsqrt * g[i]
 
     return mean + stdev * r
 
@@ -272,24 +417,108 @@ def create_gaussian_1D(M, mean, stdev, cl):
     if stdev < 0:
         raise ValueError("Standard deviation std must be non-negative.")
 
-    Z = np.random.normal(0, stdev, M)  # zero mean
+    with _stage("create_gaussian_1D", "random") as st:
+        Z = st.output(np.random.normal(0, stdev, M))  # zero mean
 
     # Gaussian filter
-    x = np.linspace(-M / 2, M / 2, M) / cl
-    F = np.exp(-2 * x**2)
+    with _stage("create_gaussian_1D", "filter") as st:
+        x = np.linspace(-M / 2, M / 2, M) / cl
+        F = st.output(np.exp(-2 * x**2))
 
     # Fourier transform the signal and filter
-    fZ = np.fft.fft(Z)
-    fF = np.fft.fft(F)
+    with _stage("create_gaussian_1D", "fft") as st:
+        fZ = np.fft.fft(Z)
+        fF = st.output(np.fft.fft(F))
 
     # correlation is the scaled inverse Fourier transform of the product
-    f = np.sqrt(2 / cl / np.sqrt(np.pi)) * np.fft.ifft(fZ * fF)
+    with _stage("create_gaussian_1D", "ifft") as st:
+        f = st.output(np.sqrt(2 / cl / np.sqrt(np.pi)) * np.fft.ifft(fZ * fF))
 
     # shift the correlation
     return mean + f.real
 
 
-def autocorrelation(x):
+def _rng(seed=None):
+    """
+    Return the source of random numbers for a generator.
+
+    When `seed` is None the global `np.random` state is used so that
+    `np.random.seed()` continues to control every routine in this module.
+
+    Args:
+        seed: None, an integer seed, or a `np.random.Generator`
+
+    Returns:
+        object with `random()`, `normal()`, and `standard_normal()` methods
+    """
+    if seed is None:
+        return np.random
+    return np.random.default_rng(seed)
+
+
+def create_gaussian_field(shape, mean, stdev, cl, seed=None):
+    """
+    Generate a 1D, 2D, or 3D array of values with Gaussian autocorrelation.
+
+    This extends `create_gaussian_1D` to more dimensions.  White Gaussian
+    noise is filtered in the frequency domain by the same Gaussian filter
+    so that the field has the autocorrelation function exp(-(r/cl)**2).
+
+    The filter is normalized so that the values have the requested mean and
+    standard deviation regardless of the correlation length.  The correlation
+    length can be a single number or one value per axis.  A correlation
+    length of zero leaves that axis uncorrelated, e.g., `cl=(0, 5, 5)` creates
+    a stack of independent 2D fields.
+
+    Args:
+        shape:  dimensions of desired array    [-]
+        mean:   average value of field         [gray levels]
+        stdev:  standard deviation of field    [gray levels]
+        cl:     correlation length(s)          [# of pixels]
+        seed:   optional seed or `np.random.Generator`
+
+    Returns:
+        array with the requested shape
+    """
+    shape = (shape,) if np.isscalar(shape) else tuple(shape)
+    cls = np.broadcast_to(np.asarray(cl, dtype=float), (len(shape),))
+
+    if np.any(cls < 0) or not np.any(cls > 0):
+        raise ValueError("Correlation length cl must be positive.")
+
+    if any(n <= 2 * c for n, c in zip(shape, cls)):
+        raise ValueError("Array size must be at least twice the correlation length cl.")
+
+    if stdev < 0:
+        raise ValueError("Standard deviation std must be non-negative.")
+
+    with _stage("create_gaussian_field", "random") as st:
+        Z = st.output(_rng(seed).standard_normal(shape))
+
+    # amplitude filter is the square root of the power spectrum of exp(-(r/cl)**2)
+    with _stage("create_gaussian_field", "filter") as st:
+        freqs = [np.fft.fftfreq(n) for n in shape[:-1]] + [np.fft.rfftfreq(shape[-1])]
+        grids = np.ix_(*freqs)
+        H = np.ones(1)
+        for f, c in zip(grids, cls):
+            H = H * np.exp(-0.5 * (np.pi * c * f) ** 2)
+
+        # normalize so that the filtered white noise has unit variance
+        H2 = H**2
+        H2[..., 1:] *= 2
+        if shape[-1] % 2 == 0:
+            H2[..., -1] /= 2
+        H /= np.sqrt(np.sum(H2) / np.prod(shape))
+        st.output(H)
+
+    with _stage("create_gaussian_field", "fft") as st:
+        f = st.output(scipy.fft.irfftn(scipy.fft.rfftn(Z) * H, s=shape))
+
+    with _stage("create_gaussian_field", "scale") as st:
+        return st.output(mean + stdev * f)
+
+
+def autocorrelation(x, xp=None, device=None):
     """
     Find the autocorrelation of a 1D array.
 
@@ -298,16 +527,34 @@ def autocorrelation(x):
     (2) the autocorrelation is normalized to maximum value
     (3) only the right hand side of the symmetric function is returned
 
+    Arrays from any array API library are accepted; the correlation is then
+    done with FFTs in that library.
+
     Args:
         x: 1D array
+        xp: array namespace (None to use the namespace of x)
+        device: device for the calculation in namespace xp
 
     Returns:
         autocorrelation array of same length
     """
+    xp = _namespace(x, xp=xp)
+    if xp is not np:
+        xx = _asarray(xp, x, device=device)
+        if not xp.isdtype(xx.dtype, "real floating"):
+            xx = xp.astype(xx, xp.float64)
+        xx = xx - xp.mean(xx)
+        n = xx.shape[0]
+        F = xp.fft.rfft(xx, n=scipy.fft.next_fast_len(2 * n - 1, real=True))
+        result = xp.fft.irfft(F * xp.conj(F), n=scipy.fft.next_fast_len(2 * n - 1, real=True))[:n]
+        mx = xp.max(result)
+        return result / xp.where(mx > 0, mx, xp.ones_like(mx))
+
     xx = x.astype(float)
     mean = np.mean(x)
     xx -= mean
-    result = np.correlate(xx, xx, mode="full")
+    with _stage("autocorrelation", "correlate") as st:
+        result = st.output(np.correlate(xx, xx, mode="full"))
     # could also use the faster(?)
     #   result = signal.fftconvolve(sig, sig[::-1], mode='full')
 
@@ -316,7 +563,348 @@ def autocorrelation(x):
     return result[middle:] / mx
 
 
-def create_Exponential(M, pix_per_speckle, alpha=1, shape="ellipse", polarization=1):
+def _namespace(*arrays, xp=None):
+    """
+    Return the array namespace to use for a calculation.
+
+    An explicit `xp` wins.  Otherwise the namespace of the first array that
+    is not a numpy array is used (via the array API `__array_namespace__`
+    method) and numpy is the default.
+
+    Args:
+        arrays: input arrays (may be empty)
+        xp:     explicit array namespace, e.g., `jax.numpy` or `array_api_strict`
+
+    Returns:
+        array namespace module
+    """
+    if xp is not None:
+        return xp
+    for a in arrays:
+        if not isinstance(a, np.ndarray) and hasattr(a, "__array_namespace__"):
+            return a.__array_namespace__()
+    return np
+
+
+def _asarray(xp, a, dtype=None, device=None):
+    """
+    Convert an array to namespace `xp`, optionally placing it on `device`.
+
+    Args:
+        xp:     array namespace
+        a:      array to convert
+        dtype:  optional dtype in namespace `xp`
+        device: optional device in namespace `xp`
+
+    Returns:
+        array in namespace `xp`
+    """
+    if device is None:
+        return xp.asarray(a, dtype=dtype)
+    return xp.asarray(a, dtype=dtype, device=device)
+
+
+def _correlate_same(xp, a, kernel):
+    """
+    Correlate a 2D array with a kernel using FFTs in namespace `xp`.
+
+    The result is aligned like `scipy.signal.correlate2d(a, kernel, mode="same")`.
+
+    Args:
+        xp:     array namespace
+        a:      2D real array
+        kernel: 2D real kernel
+
+    Returns:
+        array with the same shape as a
+    """
+    rows, cols = a.shape
+    kh, kw = kernel.shape
+    s = (rows + kh - 1, cols + kw - 1)
+    product = xp.fft.rfftn(a, s=s, axes=(0, 1)) * xp.fft.rfftn(xp.flip(kernel), s=s, axes=(0, 1))
+    full = xp.fft.irfftn(product, s=s, axes=(0, 1))
+    return full[kh // 2 : kh // 2 + rows, kw // 2 : kw // 2 + cols]
+
+
+def _is_jax(xp):
+    """Return True if `xp` is `jax.numpy`."""
+    return getattr(xp, "__name__", "").startswith("jax")
+
+
+def _shifted_corner(x, dims, xp=np):
+    """
+    Return `np.fft.fftshift(x)[:dims[0], :dims[1], ...]` without shifting all of x.
+
+    Args:
+        x:    array in FFT order
+        dims: size of the corner to extract along each axis
+        xp:   array namespace of x
+
+    Returns:
+        copy of the corner of the shifted array
+    """
+    index = [(np.arange(n) - L // 2) % L for n, L in zip(dims, x.shape)]
+    if xp is np:
+        return x[np.ix_(*index)]
+    for axis, i in enumerate(index):
+        x = xp.take(x, _asarray(xp, i), axis=axis)
+    return x
+
+
+def _pupil_field(xp, phase, mask):
+    """
+    Return exp(1j * phase) inside the pupil and zero elsewhere.
+
+    Args:
+        xp:    array namespace
+        phase: real array of phases
+        mask:  boolean pupil array
+
+    Returns:
+        complex array
+    """
+    ctype = xp.complex128 if phase.dtype == xp.float64 else xp.complex64
+    return xp.exp(1j * xp.astype(phase, ctype)) * xp.astype(mask, ctype)
+
+
+def _far_field(xp, x, L, dims, engine, workers=None):
+    """
+    Transform the pupil field and keep the shifted corner of the far field.
+
+    The 'full' engine zero-pads to the whole grid and does one n-D FFT.
+    The 'pruned' engine transforms one axis at a time and keeps only the
+    output samples that are needed.  The 'zoom' engine evaluates just those
+    samples with a chirp-z transform of the pupil support, so the grid is
+    never padded.  `scipy.fft` is used for numpy arrays and the `fft`
+    extension of `xp` otherwise ('zoom' is only available for numpy).
+
+    Args:
+        xp:      array namespace
+        x:       complex pupil field in the corner of the grid
+        L:       FFT grid size along each axis
+        dims:    output size along each axis
+        engine:  'full', 'pruned', or 'zoom'
+        workers: number of FFT threads (numpy only)
+
+    Returns:
+        complex far field of size dims
+    """
+    kwargs = {"overwrite_x": True, "workers": workers} if xp is np else {}
+    fft = scipy.fft if xp is np else xp.fft
+
+    if engine == "full":
+        x = fft.fftn(x, s=L, axes=tuple(range(len(L))), **kwargs)
+        return _shifted_corner(x, dims, xp)
+
+    if engine == "zoom":
+        steps = [1 / Ln for Ln in L]
+        starts = [-(Ln // 2) / Ln for Ln in L]
+        return _zoom_far_field(x, dims, steps, starts, workers)
+
+    for axis, (n, Ln) in enumerate(zip(dims, L)):
+        x = fft.fft(x, n=Ln, axis=axis, **kwargs)
+        x = xp.take(x, _asarray(xp, (np.arange(n) - Ln // 2) % Ln), axis=axis)
+    return x
+
+
+def _zoom_dft(x, m, step, start=0.0, axis=-1, workers=None):
+    """
+    Evaluate the DFT of x at m equally spaced frequencies (chirp-z transform).
+
+    The result is X[k] = sum_n x[n] exp(-2πi n (start + k step)) for
+    k = 0, ..., m-1, with frequencies in cycles per sample.  Bluestein's
+    algorithm turns this into one convolution done with FFTs of length
+    about n + m, so any frequency spacing costs the same as an unpadded FFT.
+
+    `step` and `start` may be arrays that broadcast against the other axes
+    of x (after moving `axis` to the end) so that a batch with a different
+    spacing for each member is transformed at once.
+
+    Args:
+        x:       complex array
+        m:       number of output frequencies
+        step:    frequency spacing [cycles/sample]
+        start:   first frequency [cycles/sample]
+        axis:    axis to transform
+        workers: number of FFT threads (see `scipy.fft`)
+
+    Returns:
+        complex array with m samples along axis
+    """
+    x = np.moveaxis(x, axis, -1)
+    ctype = np.result_type(x.dtype, np.complex64)
+    n = x.shape[-1]
+    nfft = scipy.fft.next_fast_len(n + m - 1)
+    step = np.asarray(step, dtype=float)[..., np.newaxis]
+    start = np.asarray(start, dtype=float)[..., np.newaxis]
+
+    # chirps are computed in double precision and then rounded to ctype
+    nn = np.arange(n)
+    a = x * np.exp(-2j * np.pi * (start * nn + 0.5 * step * nn**2)).astype(ctype)
+
+    j = np.arange(-(n - 1), m)
+    b = np.zeros(step.shape[:-1] + (nfft,), dtype=ctype)
+    b[..., j % nfft] = np.exp(1j * np.pi * step * j**2)
+
+    y = scipy.fft.fft(a, nfft, workers=workers, overwrite_x=True)
+    y *= scipy.fft.fft(b, workers=workers, overwrite_x=True)
+    y = scipy.fft.ifft(y, workers=workers, overwrite_x=True)[..., :m]
+    y *= np.exp(-1j * np.pi * step * np.arange(m) ** 2).astype(ctype)
+    return np.moveaxis(y, -1, axis)
+
+
+def _zoom_far_field(x, dims, steps, starts, workers=None):
+    """
+    Evaluate the far field of a pupil field on an arbitrary detector grid.
+
+    The chirp-z transform `_zoom_dft` is applied along each of the last
+    len(dims) axes of x in turn.
+
+    Args:
+        x:       complex pupil field (..., n1, n2, ...)
+        dims:    number of output samples along each axis
+        steps:   frequency spacing along each axis [cycles/sample]
+        starts:  first frequency along each axis [cycles/sample]
+        workers: number of FFT threads (see `scipy.fft`)
+
+    Returns:
+        complex far field (..., dims[0], dims[1], ...)
+    """
+    first = x.ndim - len(dims)
+    for axis, (m, step, start) in enumerate(zip(dims, steps, starts)):
+        x = _zoom_dft(x, m, step, start, axis=first + axis, workers=workers)
+    return x
+
+
+def _irradiance(xp, phase, mask, L, dims, engine):
+    """
+    Compute normalized speckle irradiance from pupil phases.
+
+    This is the whole exp(1j*phase)*mask -> FFT -> |.|**2 chain as one pure
+    array function so that it can be compiled (e.g., with `jax.jit`).
+
+    Args:
+        xp:     array namespace
+        phase:  real array of phases in the corner of the grid
+        mask:   boolean pupil array with the same shape as phase
+        L:      FFT grid size along each axis
+        dims:   output size along each axis
+        engine: 'full', 'pruned', or 'zoom'
+
+    Returns:
+        speckle irradiance with maximum value 1
+    """
+    x = _far_field(xp, _pupil_field(xp, phase, mask), L, dims, engine)
+    y = xp.real(x) ** 2 + xp.imag(x) ** 2
+    ymax = xp.max(y)
+    return y / xp.where(ymax > 0, ymax, xp.ones_like(ymax))
+
+
+@functools.lru_cache(maxsize=16)
+def _jax_irradiance(L, dims, engine):
+    """
+    Return a compiled `_irradiance` for jax arrays.
+
+    Args:
+        L:      FFT grid size along each axis
+        dims:   output size along each axis
+        engine: 'full', 'pruned', or 'zoom'
+
+    Returns:
+        jitted function of (phase, mask)
+    """
+    import jax  # pylint: disable=import-outside-toplevel
+    import jax.numpy as jnp  # pylint: disable=import-outside-toplevel
+
+    return jax.jit(lambda phase, mask: _irradiance(jnp, phase, mask, L, dims, engine))
+
+
+def _speckle_irradiance(routine, dims, L, radii, make_mask, plan, xp=None, device=None, seed=None):
+    """
+    Create a normalized speckle irradiance pattern with a given plan.
+
+    Random phases are only needed where the pupil is, so they are created
+    for the corner of the grid that holds the pupil.  The 'full' engine
+    zero-pads this corner to the whole grid and does one n-D FFT.  The
+    'pruned' engine transforms one axis at a time and immediately discards
+    the output samples that are not needed.  The 'zoom' engine computes only
+    the needed samples with chirp-z transforms; other array namespaces use
+    'pruned' in its place.
+
+    Phases are always drawn with numpy (see `_rng()`) and then moved to the
+    array namespace `xp`.  With jax the rest of the calculation is compiled
+    into a single fused function.
+
+    Args:
+        routine:   name of the calling function (for instrumentation)
+        dims:      output size along each axis
+        L:         FFT grid size along each axis
+        radii:     pupil radius along each axis
+        make_mask: function returning the boolean pupil for a given grid size
+        plan:      `Plan` from `plan_Exponential()`
+        xp:        array namespace (None for numpy)
+        device:    device for the arrays in namespace xp
+        seed:      optional seed or `np.random.Generator`
+
+    Returns:
+        speckle irradiance with maximum value 1
+    """
+    xp = np if xp is None else xp
+    support = _support(L, radii)
+    ctype = np.complex128 if plan.precision == "double" else np.complex64
+    ftype = np.float64 if plan.precision == "double" else np.float32
+
+    # phases uniformly distributed from 0 to 2*pi
+    with _stage(routine, "phase") as st:
+        phase = st.output((2 * np.pi * _rng(seed).random(support)).astype(ftype, copy=False))
+
+    with _stage(routine, "mask") as st:
+        mask = st.output(make_mask(support))
+
+    if xp is not np:
+        engine = "pruned" if plan.engine == "zoom" else plan.engine
+        phase = _asarray(xp, phase, device=device)
+        mask = _asarray(xp, mask, device=device)
+
+        if _is_jax(xp):
+            with _stage(routine, "fused") as st:
+                return st.output(_jax_irradiance(tuple(L), tuple(dims), engine)(phase, mask))
+
+        with _stage(routine, "fused") as st:
+            return st.output(_irradiance(xp, phase, mask, L, dims, engine))
+
+    # generate circular fill pattern
+    with _stage(routine, "exp") as st:
+        x = st.output(np.exp(1j * phase).astype(ctype, copy=False))
+        x *= mask
+
+    # take the FFT and square it
+    with _stage(routine, "fft") as st:
+        x = st.output(_far_field(np, x, L, dims, plan.engine, plan.workers))
+
+    with _stage(routine, "irradiance") as st:
+        y = st.output(x.real**2 + x.imag**2)
+
+    # normalize
+    with _stage(routine, "normalize") as st:
+        ymax = np.max(y) or 1
+        y /= ymax
+        return st.output(y)
+
+
+def create_Exponential(
+    M,
+    pix_per_speckle,
+    alpha=1,
+    shape="ellipse",
+    polarization=1,
+    engine="auto",
+    precision="double",
+    max_memory=None,
+    xp=None,
+    device=None,
+    seed=None,
+):
     """
     Generate an M x M polarized, fully-developed speckle irradiance pattern.
 
@@ -334,48 +922,72 @@ def create_Exponential(M, pix_per_speckle, alpha=1, shape="ellipse", polarizatio
     is circular and `alpha=2` will have speckles that are twice as tall as
     they are wide.
 
+    A rectangular image is created by passing `M=(rows, cols)`.  The FFT
+    grid is sized independently along each axis and rounded up to a length
+    that `scipy.fft` handles efficiently.  `pix_per_speckle` need not be an
+    integer; the 'zoom' engine evaluates the far field with chirp-z
+    transforms of the pupil alone, so large or fractional speckle sizes do
+    not require a padded grid.
+
+    The calculation is done by the fastest engine (see `plan_Exponential()`)
+    that fits inside `max_memory` bytes.  A `MemoryError` is raised before
+    any work is done if no engine fits.
+
+    The result can be created by any array API library by passing its
+    namespace as `xp` (e.g., `jax.numpy`) and optionally a `device`.  The
+    random phases always come from numpy; pass `seed` for reproducible
+    patterns that do not disturb the global `np.random` state.
+
     see Duncan & Kirkpatrick, "Algorithms for simulation of speckle," in SPIE
     Vol. 6855 (2008)
 
     Args:
-        M:               dimension of desired square speckle image
+        M:               dimension of desired square speckle image or (rows, cols)
         pix_per_speckle: number of pixels per smallest speckle.
         alpha:           ratio of horizontal to vertical speckle size
         shape:           'ellipse', 'rectangle', or 'annulus'
         polarization:    degree of polarization
+        engine:          'auto', 'full', 'pruned', or 'zoom'
+        precision:       'double', 'single', or 'auto'
+        max_memory:      memory budget in bytes (None for no limit)
+        xp:              array namespace for the result (None for numpy)
+        device:          device for the result in namespace xp
+        seed:            optional seed or `np.random.Generator`
 
     Returns:
-        M x M speckle image
+        M x M (or rows x cols) speckle image
     """
     if polarization < 0 or polarization > 1:
         raise ValueError("bad polarization. It must be 0 <= polarization <= 1.")
 
-    if polarization < 1:
-        y1 = create_Exponential(M, pix_per_speckle, alpha=alpha, shape=shape, polarization=1)
-        y2 = create_Exponential(M, pix_per_speckle, alpha=alpha, shape=shape, polarization=1)
-        return 0.5 * (1 + polarization) * y1 + 0.5 * (1 - polarization) * y2
-
-    x_radius = int(M / 2)
-    y_radius = int(alpha * M / 2)
+    rows, cols = (M, M) if np.isscalar(M) else M
 
-    L = pix_per_speckle * 2 * max(x_radius, y_radius)
+    plan = plan_Exponential(
+        (rows, cols),
+        pix_per_speckle,
+        alpha=alpha,
+        shape=shape,
+        polarization=polarization,
+        engine=engine,
+        precision=precision,
+        max_memory=max_memory,
+    )
 
-    # phases uniformly distributed from 0 to 2*pi
-    phase = 2 * np.pi * np.random.rand(L, L)
+    if polarization < 1:
+        kwargs = {"alpha": alpha, "shape": shape, "engine": plan.engine, "precision": plan.precision}
+        kwargs.update(xp=xp, device=device, seed=None if seed is None else np.random.default_rng(seed))
+        y1 = create_Exponential(M, pix_per_speckle, **kwargs)
+        y2 = create_Exponential(M, pix_per_speckle, **kwargs)
+        return 0.5 * (1 + polarization) * y1 + 0.5 * (1 - polarization) * y2
 
-    mask = _create_mask(L, x_radius, y_radius, shape=shape)
+    L, (y_radius, x_radius) = _grid_sizes((rows, cols), _speckle_sizes(pix_per_speckle, alpha, shape=shape))
+    obscuration = _obscuration(alpha)
 
-    # generate circular fill pattern
-    x = np.exp(1j * phase) * mask
+    def make_mask(n):
+        return _create_mask(n, x_radius, y_radius, shape=shape, obscuration=obscuration)
 
-    # take the FFT and square it
-    x = np.fft.fftshift(np.fft.fft2(x))
-    x = abs(x) ** 2
-
-    # extract the M x M matrix and normalize
-    y = x[:M, :M]
-    ymax = np.max(y) or 1
-    return y / ymax
+    radii = (y_radius, x_radius)
+    return _speckle_irradiance("create_Exponential", (rows, cols), L, radii, make_mask, plan, xp, device, seed)
 
 
 def statistics_plot(x, initialize=True):
@@ -465,7 +1077,18 @@ def statistics_plot(x, initialize=True):
     plt.ylabel(r"Probability Distribution Function, $p_I(i)$")
 
 
-def create_Rayleigh(N, pix_per_speckle, alpha=1, shape="ellipse"):
+def create_Rayleigh(
+    N,
+    pix_per_speckle,
+    alpha=1,
+    shape="ellipse",
+    engine="auto",
+    precision="double",
+    max_memory=None,
+    xp=None,
+    device=None,
+    seed=None,
+):
     """
     Generate an N x N unpolarized speckle irradiance pattern.
 
@@ -483,41 +1106,68 @@ def create_Rayleigh(N, pix_per_speckle, alpha=1, shape="ellipse"):
     they are wide.
 
     Args:
-        N:                dimension of desired square speckle image
+        N:                dimension of desired square speckle image or (rows, cols)
         pix_per_speckle:  number of pixels per smallest speckle.
         alpha:            ratio of horizontal width to vertical width
         shape:            'ellipse' or 'rectangle' describing the laser shape
+        engine:           'auto', 'full', 'pruned', or 'zoom' (see `plan_Exponential()`)
+        precision:        'double', 'single', or 'auto'
+        max_memory:       memory budget in bytes (None for no limit)
+        xp:               array namespace for the result (None for numpy)
+        device:           device for the result in namespace xp
+        seed:             optional seed or `np.random.Generator`
 
     Returns:
-        N x N speckle image
+        N x N (or rows x cols) speckle image
     """
-    y1 = create_Exponential(N, pix_per_speckle, shape=shape, alpha=alpha)
-    y2 = create_Exponential(N, pix_per_speckle, shape=shape, alpha=alpha)
-    return (y1 + y2) / 2
-
-
-def _create_mask_3D(M, x_radius, y_radius, z_radius, shape="ellipsoid"):
+    return create_Exponential(
+        N,
+        pix_per_speckle,
+        alpha,
+        shape,
+        0,
+        engine=engine,
+        precision=precision,
+        max_memory=max_memory,
+        xp=xp,
+        device=device,
+        seed=seed,
+    )
+
+
+def _create_mask_3D(M, x_radius, y_radius, z_radius, shape="ellipsoid", obscuration=None):
     """
     Create 3D boolean mask for designated shape.
 
     The points inside the mask will be set to True.  Three shapes
     are supported: 'cube', 'shell', or 'ellipsoid'.
 
+    A 'shell' lies between spheres with the largest and smallest radius.
+    If `obscuration` is given then the outer edge is the ellipsoid with the
+    given radii and the inner edge is that ellipsoid scaled by `obscuration`.
+
     Args:
-        M:        dimension of desired image
-        x_radius: half the horizontal width of the ellipse
-        y_radius: half the vertical width of the ellipse
-        z_radius: half the vertical width of the ellipse
-        shape:    'ellipse', 'rectangle', or 'annulus' describing the laser shape
+        M:           dimension of desired image or (Nx, Ny, Nz)
+        x_radius:    half the horizontal width of the ellipse
+        y_radius:    half the vertical width of the ellipse
+        z_radius:    half the vertical width of the ellipse
+        shape:       'cube', 'shell', or 'ellipsoid'
+        obscuration: ratio of inner to outer radius of a shell
 
     Returns:
-        M x M boolean array
+        M x M x M (or Nx x Ny x Nz) boolean array
     """
-    X, Y, Z = np.ogrid[:M, :M, :M]
+    nx, ny, nz = (M, M, M) if np.isscalar(M) else M
+    X, Y, Z = np.ogrid[:nx, :ny, :nz]
 
     if shape == "cube":
         dist = np.floor(X / x_radius / 2) + np.floor(Y / y_radius / 2) + np.floor(Z / z_radius / 2)
         mask = dist < 1
+    elif shape == "shell" and obscuration is not None:
+        dist = np.sqrt(
+            (X - x_radius) ** 2 / x_radius**2 + (Y - y_radius) ** 2 / y_radius**2 + (Z - z_radius) ** 2 / z_radius**2
+        )
+        mask = np.logical_and(dist > obscuration, dist < 1)
     elif shape == "shell":
         rmax = max(x_radius, y_radius, z_radius)
         rmin = min(x_radius, y_radius, z_radius)
@@ -534,7 +1184,20 @@ def _create_mask_3D(M, x_radius, y_radius, z_radius, shape="ellipsoid"):
     return mask
 
 
-def create_Exponential_3D(M, pix_per_speckle, alpha=1, beta=1, shape="ellipsoid", polarization=1):
+def create_Exponential_3D(
+    M,
+    pix_per_speckle,
+    alpha=1,
+    beta=1,
+    shape="ellipsoid",
+    polarization=1,
+    engine="auto",
+    precision="double",
+    max_memory=None,
+    xp=None,
+    device=None,
+    seed=None,
+):
     """
     Generate an M x M x M polarized, fully-developed speckle irradiance pattern.
 
@@ -552,50 +1215,83 @@ def create_Exponential_3D(M, pix_per_speckle, alpha=1, beta=1, shape="ellipsoid"
     is circular and `alpha=2` will have speckles that with y-dimensions that
     are twice the x-dimension.
 
+    A non-cubic volume is created by passing `M=(Nx, Ny, Nz)`.  The FFT
+    grid is sized independently along each axis and rounded up to a length
+    that `scipy.fft` handles efficiently.  With the 'zoom' engine the grid is
+    never allocated, so large or fractional speckle sizes stay affordable.
+
+    The calculation is done by the fastest engine (see `plan_Exponential()`)
+    that fits inside `max_memory` bytes.  A `MemoryError` is raised before
+    any work is done if no engine fits.
+
+    The result can be created by any array API library by passing its
+    namespace as `xp` (e.g., `jax.numpy`) and optionally a `device`.  The
+    random phases always come from numpy; pass `seed` for reproducible
+    patterns that do not disturb the global `np.random` state.
+
     see Duncan & Kirkpatrick, "Algorithms for simulation of speckle," in SPIE
     Vol. 6855 (2008)
 
     Args:
-        M:               dimension of desired square speckle image
+        M:               dimension of desired cubic speckle image or (Nx, Ny, Nz)
         pix_per_speckle: number of pixels per smallest speckle.
         alpha:           ratio of x to y speckle size
         beta:            ratio of x to z speckle size
         shape:           'cube', 'shell', or 'ellipsoid'
         polarization:    degree of polarization (0-1)
+        engine:          'auto', 'full', 'pruned', or 'zoom'
+        precision:       'double', 'single', or 'auto'
+        max_memory:      memory budget in bytes (None for no limit)
+        xp:              array namespace for the result (None for numpy)
+        device:          device for the result in namespace xp
+        seed:            optional seed or `np.random.Generator`
 
     Returns:
-        M x M X M speckle image
+        M x M X M (or Nx x Ny x Nz) speckle image
     """
+    dims = (M, M, M) if np.isscalar(M) else tuple(M)
+
+    plan = plan_Exponential(
+        dims,
+        pix_per_speckle,
+        alpha=alpha,
+        beta=beta,
+        shape=shape,
+        polarization=polarization,
+        engine=engine,
+        precision=precision,
+        max_memory=max_memory,
+    )
+
     if polarization < 1:
-        y1 = create_Exponential_3D(M, pix_per_speckle, alpha=alpha, shape=shape, polarization=1)
-        y2 = create_Exponential_3D(M, pix_per_speckle, alpha=alpha, shape=shape, polarization=1)
+        kwargs = {"alpha": alpha, "beta": beta, "shape": shape, "engine": plan.engine, "precision": plan.precision}
+        kwargs.update(xp=xp, device=device, seed=None if seed is None else np.random.default_rng(seed))
+        y1 = create_Exponential_3D(M, pix_per_speckle, **kwargs)
+        y2 = create_Exponential_3D(M, pix_per_speckle, **kwargs)
         return 0.5 * (1 + polarization) * y1 + 0.5 * (1 - polarization) * y2
 
-    x_radius = int(M / 2)
-    y_radius = int(alpha * M / 2)
-    z_radius = int(beta * M / 2)
+    L, radii = _grid_sizes(dims, _speckle_sizes(pix_per_speckle, alpha, beta, ndim=3, shape=shape))
+    obscuration = _obscuration(alpha, beta, ndim=3)
 
-    L = pix_per_speckle * 2 * max(x_radius, y_radius, z_radius)
+    def make_mask(n):
+        return _create_mask_3D(n, *radii, shape=shape, obscuration=obscuration)
 
-    # phases uniformly distributed from 0 to 2*pi
-    phase = 2 * np.pi * np.random.rand(L, L, L)
+    return _speckle_irradiance("create_Exponential_3D", dims, L, radii, make_mask, plan, xp, device, seed)
 
-    mask = _create_mask_3D(L, x_radius, y_radius, z_radius, shape=shape)
 
-    # generate circular fill pattern
-    x = np.exp(1j * phase) * mask
-
-    # take the FFT and square it
-    x = np.fft.fftshift(np.fft.fftn(x))
-    x = abs(x) ** 2
-
-    # extract the M x M matrix and normalize
-    y = x[:M, :M, :M]
-    ymax = np.max(y) or 1
-    return y / ymax
-
-
-def create_Rayleigh_3D(M, pix_per_speckle, alpha=1, beta=1, shape="ellipsoid"):
+def create_Rayleigh_3D(
+    M,
+    pix_per_speckle,
+    alpha=1,
+    beta=1,
+    shape="ellipsoid",
+    engine="auto",
+    precision="double",
+    max_memory=None,
+    xp=None,
+    device=None,
+    seed=None,
+):
     """
     Generate an M x M x M unpolarized speckle irradiance pattern.
 
@@ -613,16 +1309,35 @@ def create_Rayleigh_3D(M, pix_per_speckle, alpha=1, beta=1, shape="ellipsoid"):
     they are wide.
 
     Args:
-        M:                dimension of desired square speckle image
+        M:                dimension of desired cubic speckle image or (Nx, Ny, Nz)
         pix_per_speckle:  number of pixels per smallest speckle.
         alpha:            ratio of x to y speckle size
         beta:             ratio of x to z speckle size
-        shape:           'cube', 'shell', or 'ellipsoid'
+        shape:            'cube', 'shell', or 'ellipsoid'
+        engine:           'auto', 'full', 'pruned', or 'zoom' (see `plan_Exponential()`)
+        precision:        'double', 'single', or 'auto'
+        max_memory:       memory budget in bytes (None for no limit)
+        xp:               array namespace for the result (None for numpy)
+        device:           device for the result in namespace xp
+        seed:             optional seed or `np.random.Generator`
 
     Returns:
-        M x M X M speckle image
+        M x M X M (or Nx x Ny x Nz) speckle image
     """
-    return create_Exponential_3D(M, pix_per_speckle, alpha, beta, shape, 0)
+    return create_Exponential_3D(
+        M,
+        pix_per_speckle,
+        alpha,
+        beta,
+        shape,
+        0,
+        engine=engine,
+        precision=precision,
+        max_memory=max_memory,
+        xp=xp,
+        device=device,
+        seed=seed,
+    )
 
 
 def slice_plot(data, x, y, z, initialize=True, show_sqrt=True):
@@ -736,6 +1451,7 @@ def tvalues(r, N=1):
         pairs of random numbers
     """
     z1, z2 = zvalues(r, N=N)
-    t1 = scipy.stats.norm.cdf(z1)
-    t2 = scipy.stats.norm.cdf(z2)
+    # ndtr is the normal CDF without the per-call overhead of scipy.stats
+    t1 = scipy.special.ndtr(z1)
+    t2 = scipy.special.ndtr(z2)
     return t1, t2
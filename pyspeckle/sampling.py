@@ -0,0 +1,204 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Speckle irradiance at arbitrary detector coordinates.
+
+Fiber bundles and sparse sensor layouts only record the speckle at a few
+thousand scattered positions.  `create_Exponential` has to compute the far
+field on the whole padded grid, but the far field at any point is just a
+sum over the random phasors in the pupil.  `create_Exponential_at`
+evaluates that sum only at the requested coordinates, either directly (for
+small numbers of points) or with a type-2 non-uniform FFT from the optional
+`finufft` package, so the cost grows with the number of points instead of
+with the size of the image::
+
+    points = np.random.default_rng(1).uniform(0, 1024, (5000, 2))
+    y = pyspeckle.create_Exponential_at(points, 1024, 4, seed=7)
+
+The pupil and its random phases are the same as those used by
+`create_Exponential(M, pix_per_speckle, seed=seed)` (or by
+`create_Exponential_3D`), so sampling at integer coordinates reproduces
+that pattern except for its normalization.
+"""
+
+import numpy as np
+
+from .instrument import _stage
+from .planner import _grid_sizes, _obscuration, _speckle_sizes, _support
+from .pyspeckle import _create_mask, _create_mask_3D, _rng
+
+__all__ = ("create_Exponential_at",)
+
+METHODS = ("auto", "direct", "nufft")
+
+# width of the finufft spreading kernel (about 12 points at eps=1e-9)
+_NUFFT_WIDTH = 12
+
+
+def _finufft():
+    """Return the finufft module or None if it is not installed."""
+    try:
+        import finufft  # pylint: disable=import-outside-toplevel,import-error
+    except ImportError:
+        return None
+    return finufft
+
+
+def _direct(pupil, freqs, chunk):
+    """
+    Sum the pupil phasors at each frequency, one axis at a time.
+
+    Args:
+        pupil: complex pupil field (n1, n2, ...)
+        freqs: frequencies for each point and axis (points, ndim) [cycles/sample]
+        chunk: number of points evaluated at once
+
+    Returns:
+        complex field at each point
+    """
+    n = [np.arange(s) for s in pupil.shape]
+    flat = pupil.reshape(pupil.shape[0], -1)
+    out = np.empty(len(freqs), dtype=complex)
+    for start in range(0, len(freqs), chunk):
+        f = freqs[start : start + chunk]
+        t = np.exp(-2j * np.pi * np.outer(f[:, 0], n[0])) @ flat
+        t = t.reshape((len(f),) + pupil.shape[1:])
+        for axis in range(1, pupil.ndim):
+            e = np.exp(-2j * np.pi * np.outer(f[:, axis], n[axis]))
+            t = np.einsum("pi...,pi->p...", t, e)
+        out[start : start + chunk] = t
+    return out
+
+
+def _nufft(finufft, pupil, freqs, eps, workers):
+    """
+    Evaluate the pupil phasor sum with a type-2 non-uniform FFT.
+
+    finufft numbers the modes from -n//2 instead of from 0, which only
+    multiplies the field at each point by a phase factor.
+
+    Args:
+        finufft: the finufft module
+        pupil:   complex pupil field (n1, n2) or (n1, n2, n3)
+        freqs:   frequencies for each point and axis (points, ndim) [cycles/sample]
+        eps:     requested relative accuracy
+        workers: number of threads (None for finufft's default)
+
+    Returns:
+        complex field at each point
+    """
+    x = np.mod(2 * np.pi * freqs + np.pi, 2 * np.pi) - np.pi
+    coords = [np.ascontiguousarray(x[:, axis]) for axis in range(pupil.ndim)]
+    kwargs = {"eps": eps, "isign": -1}
+    if workers is not None:
+        kwargs["nthreads"] = workers
+    nufft = finufft.nufft2d2 if pupil.ndim == 2 else finufft.nufft3d2
+    return nufft(*coords, np.ascontiguousarray(pupil, dtype=complex), **kwargs)
+
+
+def create_Exponential_at(
+    points,
+    M,
+    pix_per_speckle,
+    alpha=1,
+    beta=1,
+    shape=None,
+    method="auto",
+    eps=1e-9,
+    chunk=4096,
+    seed=None,
+    workers=None,
+):
+    """
+    Generate polarized, fully-developed speckle irradiance at arbitrary points.
+
+    Each row of `points` holds the (possibly fractional) indices of one
+    point along the axes of the array that `create_Exponential(M, ...)`
+    (two columns, rows then columns) or `create_Exponential_3D(M, ...)`
+    (three columns, x then y then z) would return.  The speckle field is
+    periodic with the FFT grid of that array.
+
+    The 'direct' method costs about `len(points)` times the number of
+    pupil samples and needs nothing beyond numpy.  The 'nufft' method uses
+    `finufft` and costs about the pupil size times its logarithm plus a
+    constant per point.  'auto' picks the cheaper one that is available.
+
+    The irradiance is scaled so that its expected mean is 1.  Divide by
+    the maximum over a full grid of points to match `create_Exponential`.
+
+    Args:
+        points:          coordinates (..., 2) or (..., 3) [pixels]
+        M:               size of the corresponding image, (rows, cols), or (Nx, Ny, Nz)
+        pix_per_speckle: number of pixels per smallest speckle
+        alpha:           ratio of x to y speckle size
+        beta:            ratio of x to z speckle size (3D only)
+        shape:           pupil shape (None for 'ellipse' or 'ellipsoid')
+        method:          'auto', 'direct', or 'nufft'
+        eps:             relative accuracy requested from finufft
+        chunk:           number of points summed at once by the direct method
+        seed:            optional seed or `np.random.Generator`
+        workers:         number of finufft threads
+
+    Returns:
+        speckle irradiance with shape points.shape[:-1]
+    """
+    points = np.asarray(points, dtype=float)
+    ndim = points.shape[-1] if points.ndim else 0
+    if ndim not in (2, 3):
+        raise ValueError("points must have shape (..., 2) or (..., 3).")
+
+    method = method.lower()
+    if method not in METHODS:
+        raise ValueError("method must be one of %s" % ", ".join(METHODS))
+
+    dims = (M,) * ndim if np.isscalar(M) else tuple(M)
+    if len(dims) != ndim:
+        raise ValueError("M must have one size for each coordinate.")
+
+    routine = "create_Exponential_at"
+    if shape is None:
+        shape = "ellipse" if ndim == 2 else "ellipsoid"
+    L, radii = _grid_sizes(dims, _speckle_sizes(pix_per_speckle, alpha, beta, ndim=ndim, shape=shape))
+    obscuration = _obscuration(alpha, beta, ndim=ndim)
+    support = _support(L, radii)
+
+    # same phases and pupil as create_Exponential and create_Exponential_3D
+    with _stage(routine, "phase") as st:
+        phase = st.output(2 * np.pi * _rng(seed).random(support))
+
+    with _stage(routine, "mask") as st:
+        if ndim == 2:
+            mask = _create_mask(support, radii[1], radii[0], shape=shape, obscuration=obscuration)
+        else:
+            mask = _create_mask_3D(support, *radii, shape=shape, obscuration=obscuration)
+        st.output(mask)
+
+    pupil = np.exp(1j * phase) * mask
+
+    # frequency of each point in the shifted far field
+    freqs = points.reshape(-1, ndim) - [n // 2 for n in L]
+    freqs /= L
+
+    finufft = _finufft()
+    if method == "nufft" and finufft is None:
+        raise ImportError("method='nufft' requires the finufft package.")
+
+    if method == "auto":
+        size = pupil.size
+        direct_cost = len(freqs) * size
+        nufft_cost = 2**ndim * size * np.log2(2**ndim * size) + len(freqs) * _NUFFT_WIDTH**ndim
+        method = "nufft" if finufft is not None and nufft_cost < direct_cost else "direct"
+
+    with _stage(routine, method) as st:
+        if method == "nufft":
+            E = _nufft(finufft, pupil, freqs, eps, workers)
+        else:
+            E = _direct(pupil, freqs, max(1, chunk))
+        st.output(E)
+
+    with _stage(routine, "irradiance") as st:
+        y = E.real**2 + E.imag**2
+        y /= np.count_nonzero(mask) or 1
+        return st.output(y.reshape(points.shape[:-1]))
@@ -0,0 +1,274 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Speckle produced by light scattered from a rough surface.
+
+A rough surface with a Gaussian height distribution and a Gaussian
+autocorrelation function is created with `rough_surface()`, converted into
+a phase screen at a given wavelength with `phase_screen()`, and propagated
+to an observation plane with `propagate()` using the Fraunhofer, Fresnel, or
+angular spectrum method.  `create_Scattered()` does all of these steps.
+
+Surfaces whose RMS height is small compared to the wavelength produce
+partially developed speckle with a strong specular component; rougher
+surfaces produce fully developed speckle.  For example, a surface with
+0.05 µm RMS roughness and a 2 µm correlation length sampled every 0.5 µm
+and illuminated by a 200 µm spot at 0.633 µm is::
+
+    x = pyspeckle.create_Scattered((1024, 1024), 0.05, 2, 0.633, 0.5, spot=200)
+
+All lengths must be in the same units.  Propagation kernels for each
+(grid, wavelength, sampling, distance, method) are computed once and cached,
+and a stack of surfaces with shape (batch, rows, cols) is propagated with a
+single forward and inverse FFT.
+"""
+
+import functools
+import numpy as np
+import scipy.fft
+
+from .instrument import _stage
+from .pyspeckle import create_gaussian_field
+
+__all__ = (
+    "rough_surface",
+    "phase_screen",
+    "propagation_kernel",
+    "propagate",
+    "create_Scattered",
+)
+
+METHODS = ("fraunhofer", "fresnel", "angular")
+
+
+def rough_surface(shape, rms, cl, dx=1, seed=None):
+    """
+    Create a random rough surface with Gaussian statistics.
+
+    The heights are normally distributed with zero mean and standard
+    deviation `rms` and have the autocorrelation function exp(-(r/cl)**2)
+    (see `create_gaussian_field()`).  A shape of (batch, rows, cols)
+    creates a stack of independent surfaces.
+
+    Args:
+        shape: (rows, cols) or (batch, rows, cols)
+        rms:   root-mean-square surface height
+        cl:    correlation length (same units as dx)
+        dx:    sample spacing
+        seed:  optional seed or `np.random.Generator`
+
+    Returns:
+        array of surface heights with the requested shape
+    """
+    shape = tuple(shape)
+    if len(shape) not in (2, 3):
+        raise ValueError("shape must be (rows, cols) or (batch, rows, cols).")
+
+    cls = (cl / dx, cl / dx) if len(shape) == 2 else (0, cl / dx, cl / dx)
+    with _stage("rough_surface", "heights") as st:
+        return st.output(create_gaussian_field(shape, 0, rms, cls, seed=seed))
+
+
+def phase_screen(height, wavelength, mode="reflection", index=1.5, spot=None, dx=1):
+    """
+    Convert surface heights into a complex field just after the surface.
+
+    For normal incidence the phase is 4π h/λ in reflection and
+    2π (n-1) h/λ in transmission through a surface with refractive index n.
+    The illuminated region can be limited to a centered circular `spot`.
+
+    Args:
+        height:     surface heights (..., rows, cols)
+        wavelength: wavelength of light
+        mode:       'reflection' or 'transmission'
+        index:      refractive index for transmission
+        spot:       diameter of the illuminated spot (None for the whole grid)
+        dx:         sample spacing
+
+    Returns:
+        complex field with the same shape as height
+    """
+    mode = mode.lower()
+    if mode == "reflection":
+        k = 4 * np.pi / wavelength
+    elif mode == "transmission":
+        k = 2 * np.pi * (index - 1) / wavelength
+    else:
+        raise ValueError("mode must be 'reflection' or 'transmission'")
+
+    height = np.asarray(height, dtype=float)
+    with _stage("phase_screen", "exp") as st:
+        field = st.output(np.exp(1j * k * height))
+
+    if spot is not None:
+        rows, cols = height.shape[-2:]
+        y = (np.arange(rows) - rows / 2)[:, np.newaxis] * dx
+        x = (np.arange(cols) - cols / 2)[np.newaxis, :] * dx
+        field *= x**2 + y**2 <= (spot / 2) ** 2
+
+    return field
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_kernel(shape, wavelength, dx, z, method):
+    """
+    Compute a read-only propagation transfer function (see `propagation_kernel`).
+
+    Args:
+        shape:      (rows, cols) of the grid
+        wavelength: wavelength of light
+        dx:         sample spacing
+        z:          propagation distance
+        method:     'fresnel' or 'angular'
+
+    Returns:
+        complex (rows, cols) array in FFT order
+    """
+    fy = scipy.fft.fftfreq(shape[0], dx)[:, np.newaxis]
+    fx = scipy.fft.fftfreq(shape[1], dx)[np.newaxis, :]
+    f2 = fx**2 + fy**2
+
+    if method == "fresnel":
+        H = np.exp(2j * np.pi * z / wavelength) * np.exp(-1j * np.pi * wavelength * z * f2)
+    else:
+        kz2 = 1 / wavelength**2 - f2
+        H = np.where(kz2 > 0, np.exp(2j * np.pi * z * np.sqrt(np.maximum(kz2, 0))), 0)
+
+    H.flags.writeable = False
+    return H
+
+
+def propagation_kernel(shape, wavelength, dx, z, method="angular"):
+    """
+    Return the transfer function for propagation over a distance z.
+
+    The Fresnel kernel is exp(ikz) exp(-iπλz(fx² + fy²)); the angular
+    spectrum kernel is exp(2πiz√(1/λ² - fx² - fy²)) with evanescent waves
+    removed.  Both are returned in FFT order.
+
+    Results are cached, so repeated calls with the same arguments return
+    the same read-only array.
+
+    Args:
+        shape:      (rows, cols) of the grid
+        wavelength: wavelength of light
+        dx:         sample spacing
+        z:          propagation distance
+        method:     'fresnel' or 'angular'
+
+    Returns:
+        complex (rows, cols) array
+    """
+    method = method.lower()
+    if method not in ("fresnel", "angular"):
+        raise ValueError("method must be 'fresnel' or 'angular'")
+
+    shape = tuple(int(n) for n in shape[-2:])
+    return _cached_kernel(shape, float(wavelength), float(dx), float(z), method)
+
+
+def propagate(field, wavelength, dx, z=None, method="fraunhofer", workers=None):
+    """
+    Propagate a complex field to an observation plane.
+
+    The 'fraunhofer' method returns the far field with the zero spatial
+    frequency at the center of the array.  Each sample corresponds to a
+    change of λ/(N dx) in the direction sine, or λz/(N dx) on a screen at
+    distance z.  The transform is unitary so the total power is unchanged.
+
+    The 'fresnel' and 'angular' methods return the field at distance `z`
+    on the same grid as the input (see `propagation_kernel()`).
+
+    Stacks of fields with shape (..., rows, cols) share one transform.
+
+    Args:
+        field:      complex field(s) just after the surface
+        wavelength: wavelength of light
+        dx:         sample spacing
+        z:          propagation distance (ignored for 'fraunhofer')
+        method:     'fraunhofer', 'fresnel', or 'angular'
+        workers:    number of threads for the FFT (see `scipy.fft`)
+
+    Returns:
+        complex field(s) with the same shape as field
+    """
+    method = method.lower()
+    if method not in METHODS:
+        raise ValueError("method must be 'fraunhofer', 'fresnel', or 'angular'")
+
+    field = np.asarray(field)
+    if field.ndim < 2:
+        raise ValueError("Field must have at least two dimensions.")
+
+    if method == "fraunhofer":
+        with _stage("propagate", "fft") as st:
+            E = scipy.fft.fft2(field, norm="ortho", workers=workers)
+            return st.output(scipy.fft.fftshift(E, axes=(-2, -1)))
+
+    if z is None:
+        raise ValueError("A propagation distance z is needed for the '%s' method." % method)
+
+    with _stage("propagate", "kernel") as st:
+        H = st.output(propagation_kernel(field.shape, wavelength, dx, z, method))
+
+    with _stage("propagate", "fft") as st:
+        E = st.output(scipy.fft.fft2(field, workers=workers))
+        E *= H
+
+    with _stage("propagate", "ifft") as st:
+        return st.output(scipy.fft.ifft2(E, overwrite_x=True, workers=workers))
+
+
+def create_Scattered(
+    shape,
+    rms,
+    cl,
+    wavelength,
+    dx,
+    z=None,
+    method="fraunhofer",
+    spot=None,
+    mode="reflection",
+    index=1.5,
+    seed=None,
+    workers=None,
+):
+    """
+    Generate speckle scattered by a random rough surface.
+
+    A rough surface (see `rough_surface()`) is turned into a phase screen
+    (see `phase_screen()`) and propagated to the observation plane (see
+    `propagate()`).  The irradiance is in the same units as the incident
+    irradiance, so the specular component of a smooth surface is not
+    normalized away.  A shape of (batch, rows, cols) creates a stack of
+    patterns from independent surfaces.
+
+    For Fraunhofer propagation the speckle size is about N dx / spot
+    samples, so a `spot` smaller than the grid is needed to resolve the
+    speckle.
+
+    Args:
+        shape:      (rows, cols) or (batch, rows, cols)
+        rms:        root-mean-square surface height
+        cl:         correlation length of the surface
+        wavelength: wavelength of light
+        dx:         sample spacing on the surface
+        z:          propagation distance (ignored for 'fraunhofer')
+        method:     'fraunhofer', 'fresnel', or 'angular'
+        spot:       diameter of the illuminated spot (None for the whole grid)
+        mode:       'reflection' or 'transmission'
+        index:      refractive index for transmission
+        seed:       optional seed or `np.random.Generator`
+        workers:    number of threads for the FFT (see `scipy.fft`)
+
+    Returns:
+        irradiance array with the requested shape
+    """
+    height = rough_surface(shape, rms, cl, dx, seed=seed)
+    field = phase_screen(height, wavelength, mode, index, spot, dx)
+    E = propagate(field, wavelength, dx, z, method, workers)
+
+    with _stage("create_Scattered", "irradiance") as st:
+        return st.output(E.real**2 + E.imag**2)
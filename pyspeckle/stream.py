@@ -0,0 +1,351 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Endless streams of speckle patterns for training loops.
+
+Generating speckle inside a training loop stalls each step, and storing
+precomputed patterns needs a lot of disk.  A `SpeckleStream` creates batches
+of patterns on background threads while the previous batches are being
+consumed.  Batches are written into a small ring of preallocated buffers so
+no memory is allocated once the stream is running::
+
+    stream = pyspeckle.SpeckleStream((256, 256), 4, batch_size=32, prefetch=2, seed=7)
+    for batch in stream:
+        train_step(batch)        # batch has shape (32, 256, 256)
+
+The batch returned by the stream is a view into the ring and is overwritten
+once `prefetch` more batches have been requested; pass `copy=True` (or copy
+it yourself) if it must be kept.
+
+Every pattern is created from its own seed derived from (seed, worker,
+batch, index).  The sequence of batches is therefore identical no matter
+how many threads are used, and different data-loader workers never repeat
+each other.  `SpeckleDataset` provides the iterable-dataset protocol used by
+PyTorch and `torch_dataset()` wraps it as a real
+`torch.utils.data.IterableDataset`.
+"""
+
+import functools
+import sys
+import threading
+import weakref
+import numpy as np
+
+from .pyspeckle import create_Exponential
+
+__all__ = (
+    "SpeckleStream",
+    "SpeckleDataset",
+    "torch_dataset",
+)
+
+
+def _pattern_seed(entropy, worker, batch, index):
+    """
+    Return the random generator for one pattern in a stream.
+
+    Args:
+        entropy: base entropy of the stream
+        worker:  index of the data-loader worker
+        batch:   index of the batch
+        index:   index of the pattern within the batch
+
+    Returns:
+        a `np.random.Generator`
+    """
+    ss = np.random.SeedSequence(entropy, spawn_key=(worker, batch, index))
+    return np.random.default_rng(ss)
+
+
+class _RingState:  # pylint: disable=too-few-public-methods
+    """Bookkeeping shared by a `SpeckleStream` and its background threads."""
+
+    def __init__(self):
+        """Start with no batches requested, generated, or released."""
+        self.cond = threading.Condition()
+        self.ready = set()
+        self.error = None
+        self.stopped = False
+        self.next = 0
+        self.released = 0
+
+
+def _stop(ring):
+    """Tell the background threads of a stream to exit."""
+    with ring.cond:
+        ring.stopped = True
+        ring.cond.notify_all()
+
+
+def _produce(ref, ring, nbuf, max_batches):
+    """
+    Fill buffers until the stream is closed or collected (runs on each thread).
+
+    Only a weak reference to the stream is kept, and the stream is only
+    referenced while a batch is being filled.
+
+    Args:
+        ref:         weak reference to the `SpeckleStream`
+        ring:        its `_RingState`
+        nbuf:        number of buffers in the ring
+        max_batches: number of batches before stopping (None for endless)
+    """
+    while True:
+        with ring.cond:
+            while not ring.stopped and (
+                ring.next >= ring.released + nbuf or (max_batches is not None and ring.next >= max_batches)
+            ):
+                ring.cond.wait()
+            if ring.stopped:
+                return
+            batch = ring.next
+            ring.next += 1
+
+        stream = ref()
+        if stream is None:
+            return
+
+        try:
+            stream._fill(batch)  # pylint: disable=protected-access
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            with ring.cond:
+                ring.error = e
+                ring.stopped = True
+                ring.cond.notify_all()
+            return
+        finally:
+            del stream
+
+        with ring.cond:
+            ring.ready.add(batch)
+            ring.cond.notify_all()
+
+
+class SpeckleStream:
+    """
+    Iterator over batches of speckle patterns made on background threads.
+
+    Any generator that accepts a `seed` keyword can be used, e.g.,
+    `create_Rayleigh` or `create_Exponential_3D`.  The positional `args` and
+    keyword `kwargs` are passed to it for every pattern.
+
+    Up to `prefetch` batches are generated ahead of the consumer.  The ring
+    holds `prefetch + 1` buffers: one for the batch being consumed and
+    `prefetch` being filled.
+
+    Args:
+        *args:       positional arguments for the generator (e.g., M, pix_per_speckle)
+        batch_size:  number of patterns in each batch
+        generator:   function returning one pattern (default `create_Exponential`)
+        prefetch:    number of batches generated ahead of the consumer
+        threads:     number of background threads
+        seed:        integer seed (None for a different stream every time)
+        dtype:       data type of the batches
+        copy:        return copies instead of views into the ring
+        max_batches: number of batches before stopping (None for endless)
+        worker:      index of this worker among `num_workers`
+        num_workers: number of independent workers sharing the seed
+        **kwargs:    keyword arguments for the generator
+    """
+
+    def __init__(
+        self,
+        *args,
+        batch_size=16,
+        generator=create_Exponential,
+        prefetch=2,
+        threads=1,
+        seed=None,
+        dtype=np.float32,
+        copy=False,
+        max_batches=None,
+        worker=0,
+        num_workers=1,
+        **kwargs,
+    ):
+        """Initialize the stream; no work is done until iteration starts."""
+        if batch_size < 1 or prefetch < 1 or threads < 1:
+            raise ValueError("batch_size, prefetch, and threads must all be at least 1.")
+
+        if not 0 <= worker < num_workers:
+            raise ValueError("worker must be 0 <= worker < num_workers.")
+
+        self.args = args
+        self.kwargs = kwargs
+        self.batch_size = batch_size
+        self.generator = generator
+        self.prefetch = prefetch
+        self.threads = threads
+        self.dtype = np.dtype(dtype)
+        self.copy = copy
+        self.max_batches = max_batches
+        self.worker = worker
+        self.num_workers = num_workers
+        self.entropy = np.random.SeedSequence(seed).entropy
+
+        self.buffers = None
+        self._ring = _RingState()
+        self._threads = []
+        self._finalizer = None
+        self._count = 0
+        self._first = None
+
+    def _pattern(self, batch, index):
+        """Generate one pattern of the stream."""
+        rng = _pattern_seed(self.entropy, self.worker, batch, index)
+        return self.generator(*self.args, seed=rng, **self.kwargs)
+
+    def _start(self):
+        """Allocate the ring of buffers and start the background threads."""
+        self._first = self._pattern(0, 0)
+        nbuf = self.prefetch + 1
+        self.buffers = np.empty((nbuf, self.batch_size) + np.shape(self._first), dtype=self.dtype)
+
+        # the threads only hold a weak reference so an abandoned stream is
+        # collected, and collecting it stops the threads
+        self._finalizer = weakref.finalize(self, _stop, self._ring)
+        ref = weakref.ref(self)
+        for _ in range(self.threads):
+            t = threading.Thread(target=_produce, args=(ref, self._ring, nbuf, self.max_batches), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _fill(self, batch):
+        """Generate all patterns of one batch into its ring buffer."""
+        buf = self.buffers[batch % len(self.buffers)]
+        for i in range(self.batch_size):
+            if batch == 0 and i == 0:
+                buf[0] = self._first
+                self._first = None
+            else:
+                buf[i] = self._pattern(batch, i)
+
+    def __iter__(self):
+        """Return the stream itself."""
+        return self
+
+    def __next__(self):
+        """
+        Return the next batch, waiting for it if necessary.
+
+        Returns:
+            array of shape (batch_size, ...) with the patterns
+        """
+        if self.max_batches is not None and self._count >= self.max_batches:
+            self.close()
+            raise StopIteration
+
+        if not self._threads:
+            self._start()
+
+        ring = self._ring
+        with ring.cond:
+            # the batch returned by the previous call may now be overwritten
+            ring.released = self._count
+            ring.cond.notify_all()
+            while self._count not in ring.ready and ring.error is None and not ring.stopped:
+                ring.cond.wait()
+            if ring.error is not None:
+                raise ring.error
+            if self._count not in ring.ready:
+                raise StopIteration
+            ring.ready.remove(self._count)
+            batch = self._count
+            self._count += 1
+
+        out = self.buffers[batch % len(self.buffers)]
+        return out.copy() if self.copy else out
+
+    def close(self):
+        """Stop the background threads."""
+        if self._finalizer is not None:
+            self._finalizer()
+        else:
+            _stop(self._ring)
+        for t in self._threads:
+            t.join()
+
+    def __enter__(self):
+        """Use the stream as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(self, *exc):
+        """Stop the background threads."""
+        self.close()
+        return False
+
+
+def _worker_info():
+    """Return (worker, num_workers) for the current PyTorch data-loader worker."""
+    data = sys.modules.get("torch.utils.data")
+    info = data.get_worker_info() if data is not None else None
+    if info is None:
+        return 0, 1
+    return info.id, info.num_workers
+
+
+class SpeckleDataset:
+    """
+    Endless dataset of single speckle patterns.
+
+    Each iteration starts a `SpeckleStream` and yields its patterns one at a
+    time.  Inside a PyTorch data-loader worker the worker index is used to
+    give every worker a distinct, reproducible stream.  Use
+    `torch_dataset()` to get an object that `torch.utils.data.DataLoader`
+    recognizes as an iterable dataset.
+
+    Args:
+        *args:    positional arguments for the generator (e.g., M, pix_per_speckle)
+        **kwargs: keyword arguments for `SpeckleStream` and the generator
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Save the arguments for the streams."""
+        self.args = args
+        self.kwargs = kwargs
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Change the patterns produced in later iterations."""
+        self.epoch = epoch
+
+    def __iter__(self):
+        """Yield the patterns of one stream one at a time."""
+        worker, num_workers = _worker_info()
+        kwargs = dict(self.kwargs)
+        seed = kwargs.pop("seed", None)
+        if seed is not None:
+            seed = (seed, self.epoch)
+        kwargs.setdefault("batch_size", 1)
+        with SpeckleStream(*self.args, seed=seed, worker=worker, num_workers=num_workers, **kwargs) as stream:
+            for batch in stream:
+                yield from batch.copy()
+
+
+@functools.lru_cache(maxsize=1)
+def _torch_dataset_class():
+    """Create a subclass of `SpeckleDataset` and torch's `IterableDataset`."""
+    from torch.utils.data import IterableDataset  # pylint: disable=import-outside-toplevel,import-error
+
+    return type("TorchSpeckleDataset", (SpeckleDataset, IterableDataset), {})
+
+
+def torch_dataset(*args, **kwargs):
+    """
+    Create a `SpeckleDataset` that is also a `torch.utils.data.IterableDataset`.
+
+    PyTorch is only imported when this function is called.  For example::
+
+        ds = pyspeckle.torch_dataset((128, 128), 4, seed=1, batch_size=8)
+        loader = torch.utils.data.DataLoader(ds, batch_size=32, num_workers=4)
+
+    Args:
+        *args:    positional arguments for the generator (e.g., M, pix_per_speckle)
+        **kwargs: keyword arguments for `SpeckleStream` and the generator
+
+    Returns:
+        an iterable dataset
+    """
+    return _torch_dataset_class()(*args, **kwargs)
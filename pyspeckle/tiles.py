@@ -0,0 +1,232 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Seamless speckle fields larger than memory.
+
+Scanning and stage-motion simulations need one speckle field that is far
+larger than memory and in which neighboring regions match.  Independent
+calls to `create_Exponential` give tiles with discontinuous edges.  A
+`SpeckleField` is a single statistically stationary field over all
+integer coordinates (including negative ones) that is computed lazily, one
+tile at a time::
+
+    field = pyspeckle.SpeckleField(4, tile=256, seed=7)
+    a = field[1000:1512, -300:212]
+    b = field.window(1200, -100, 512, 512)   # overlaps a exactly
+
+The complex field is white circular Gaussian noise convolved with the
+amplitude point-spread function of an elliptical pupil, a jinc function
+tapered to zero beyond `support` speckles.  The noise in each tile comes
+from a seed derived from the field seed and the tile index, so any tile is
+recomputed identically on demand.  A tile is finished by convolving the
+noise of its neighborhood with the kernel (overlap-save), and the most
+recently used finished tiles are kept in a cache of `cache_tiles` entries.
+Reading any window therefore uses a bounded amount of memory.
+"""
+
+import collections
+import threading
+import numpy as np
+import scipy.signal
+import scipy.special
+
+from .instrument import _stage
+from .planner import _speckle_sizes
+
+__all__ = ("SpeckleField",)
+
+
+def _tile_seed(entropy, ty, tx):
+    """
+    Return the random generator for the noise in one tile.
+
+    Tile indices may be negative, so they are interleaved into the
+    non-negative integers before being used as a spawn key.
+
+    Args:
+        entropy: base entropy of the field
+        ty:      tile row index
+        tx:      tile column index
+
+    Returns:
+        a `np.random.Generator`
+    """
+    key = tuple(2 * k if k >= 0 else -2 * k - 1 for k in (ty, tx))
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key))
+
+
+def _kernel(sy, sx, support):
+    """
+    Return the tapered amplitude point-spread function of an elliptical pupil.
+
+    The pupil cutoff is 1/(2s) cycles/pixel along an axis with speckle size
+    s, which matches the pupil used by `create_Exponential`.  The kernel is
+    scaled so that the convolved white noise has unit mean irradiance.
+
+    Args:
+        sy:      vertical speckle size [pixels]
+        sx:      horizontal speckle size [pixels]
+        support: kernel radius [speckles]
+
+    Returns:
+        square real array with an odd number of rows
+    """
+    R = int(np.ceil(support * max(sy, sx)))
+    y, x = np.ogrid[-R : R + 1, -R : R + 1]
+    rho = np.sqrt((y / sy) ** 2 + (x / sx) ** 2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        h = np.where(rho > 0, 2 * scipy.special.jv(1, np.pi * rho) / (np.pi * rho), 1.0)
+    h *= np.where(rho < support, np.cos(np.pi * rho / (2 * support)) ** 2, 0)
+    h /= np.sqrt(np.sum(h**2))
+    return h
+
+
+class SpeckleField:
+    """
+    Unbounded, lazily computed, fully-developed speckle irradiance.
+
+    Index the field with two slices (e.g., `field[y0:y1, x0:x1]`) or call
+    `window()`.  The mean irradiance is 1.
+
+    Args:
+        pix_per_speckle: number of pixels per smallest speckle
+        alpha:           ratio of horizontal to vertical speckle size
+        tile:            size of the square tiles [pixels]
+        seed:            optional integer seed (None for a random field)
+        cache_tiles:     number of finished tiles kept in memory
+        support:         radius of the tapered kernel [speckles]
+        dtype:           floating-point type of the irradiance
+    """
+
+    def __init__(self, pix_per_speckle, alpha=1, tile=256, seed=None, cache_tiles=64, support=8, dtype=np.float64):
+        """Build the kernel; no tiles are computed until they are read."""
+        if pix_per_speckle <= 0 or alpha <= 0:
+            raise ValueError("pix_per_speckle and alpha must be positive.")
+        if tile < 1 or cache_tiles < 1 or support <= 0:
+            raise ValueError("tile, cache_tiles, and support must be positive.")
+
+        self.tile_size = int(tile)
+        self.cache_tiles = int(cache_tiles)
+        self.dtype = np.dtype(dtype)
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.kernel = _kernel(*_speckle_sizes(pix_per_speckle, alpha), support)
+        self.kernel.flags.writeable = False
+
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _noise(self, ty, tx):
+        """Return the complex white noise of one tile."""
+        rng = _tile_seed(self.entropy, ty, tx)
+        shape = (self.tile_size, self.tile_size)
+        return (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)) / np.sqrt(2)
+
+    def _compute(self, ty, tx):
+        """
+        Compute one finished tile of irradiance.
+
+        The kernel reaches R pixels beyond the tile, so the noise of every
+        tile within R pixels is assembled into one patch and the 'valid'
+        part of its convolution with the kernel is kept.
+
+        Args:
+            ty: tile row index
+            tx: tile column index
+
+        Returns:
+            tile x tile irradiance
+        """
+        T = self.tile_size
+        R = len(self.kernel) // 2
+        k = -(-R // T)
+
+        with _stage("SpeckleField", "noise") as st:
+            rows = [np.hstack([self._noise(ty + i, tx + j) for j in range(-k, k + 1)]) for i in range(-k, k + 1)]
+            patch = np.vstack(rows)
+            lo = k * T - R
+            patch = st.output(patch[lo : lo + T + 2 * R, lo : lo + T + 2 * R])
+
+        with _stage("SpeckleField", "convolve") as st:
+            E = st.output(scipy.signal.fftconvolve(patch, self.kernel, mode="valid"))
+
+        with _stage("SpeckleField", "irradiance") as st:
+            y = (E.real**2 + E.imag**2).astype(self.dtype, copy=False)
+            y.flags.writeable = False
+            return st.output(y)
+
+    def tile(self, ty, tx):
+        """
+        Return one tile of the field, computing it if it is not cached.
+
+        Tile (ty, tx) covers rows ty*tile to (ty+1)*tile - 1 and the
+        corresponding columns.
+
+        Args:
+            ty: tile row index
+            tx: tile column index
+
+        Returns:
+            read-only tile x tile irradiance
+        """
+        key = (int(ty), int(tx))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        y = self._compute(*key)
+
+        with self._lock:
+            self._cache[key] = y
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_tiles:
+                self._cache.popitem(last=False)
+        return y
+
+    def window(self, row, col, rows, cols):
+        """
+        Return a rectangular window of the field.
+
+        Args:
+            row:  first row (may be negative)
+            col:  first column (may be negative)
+            rows: number of rows
+            cols: number of columns
+
+        Returns:
+            rows x cols irradiance
+        """
+        if rows < 0 or cols < 0:
+            raise ValueError("rows and cols must not be negative.")
+
+        T = self.tile_size
+        out = np.empty((rows, cols), dtype=self.dtype)
+        for ty in range(row // T, -(-(row + rows) // T)):
+            r0 = max(row, ty * T)
+            r1 = min(row + rows, (ty + 1) * T)
+            for tx in range(col // T, -(-(col + cols) // T)):
+                c0 = max(col, tx * T)
+                c1 = min(col + cols, (tx + 1) * T)
+                y = self.tile(ty, tx)
+                out[r0 - row : r1 - row, c0 - col : c1 - col] = y[r0 - ty * T : r1 - ty * T, c0 - tx * T : c1 - tx * T]
+        return out
+
+    def __getitem__(self, key):
+        """Return field[y0:y1, x0:x1] (optionally with steps)."""
+        if not (isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, slice) for k in key)):
+            raise ValueError("Index the field with two slices, e.g., field[0:256, 0:256].")
+
+        sy, sx = key
+        if None in (sy.start, sy.stop, sx.start, sx.stop):
+            raise ValueError("The field is unbounded; slices need explicit start and stop.")
+
+        y = self.window(sy.start, sx.start, max(0, sy.stop - sy.start), max(0, sx.stop - sx.start))
+        return y[:: sy.step or 1, :: sx.step or 1]
+
+    def clear(self):
+        """Remove every cached tile."""
+        with self._lock:
+            self._cache.clear()
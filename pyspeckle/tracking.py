@@ -0,0 +1,250 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-arguments
+# pylint: disable=consider-using-f-string
+
+"""
+Track the displacement of speckle between frames.
+
+Each frame is divided into square subsets on a regular grid and the shift of
+every subset relative to the same subset of a reference frame is found by
+FFT phase correlation.  All subsets of a frame are transformed together, the
+spectra of the reference subsets are computed once and reused for every
+frame, and the correlation peak is refined to sub-pixel precision with a
+three-point Gaussian fit.  For example::
+
+    ref = pyspeckle.create_Exponential(1024, 4)
+    d = pyspeckle.track_displacement(ref, frames, subset=32, step=16)
+    print(d.dy.mean(), d.dx.mean())
+
+A first pass finds the integer shift of each subset.  Further passes move
+the subsets of the frame by that shift so that the same speckles are
+compared, which removes the bias toward zero caused by speckles entering
+and leaving the subset.
+
+A positive `dx` means the pattern moved toward larger column indices.
+"""
+
+import collections
+import numpy as np
+import scipy.fft
+
+from .instrument import _stage
+
+__all__ = (
+    "Displacement",
+    "ReferenceSpectra",
+    "reference_spectra",
+    "track_displacement",
+)
+
+Displacement = collections.namedtuple("Displacement", ["y", "x", "dy", "dx", "peak"])
+Displacement.__doc__ = """
+Displacement of every subset of one or more frames.
+
+Attributes:
+    y:    row of the center of each subset in the reference [pixels]
+    x:    column of the center of each subset in the reference [pixels]
+    dy:   displacement along the rows [pixels]
+    dx:   displacement along the columns [pixels]
+    peak: height of the phase-correlation peak (1 for a perfect match)
+"""
+
+ReferenceSpectra = collections.namedtuple("ReferenceSpectra", ["spectra", "rows", "cols", "subset", "window", "shape"])
+ReferenceSpectra.__doc__ = """
+Cached spectra of the subsets of a reference frame.
+
+Attributes:
+    spectra: conjugated spectra of the windowed subsets (ny, nx, subset, subset//2+1)
+    rows:    first row of each subset (ny,)
+    cols:    first column of each subset (nx,)
+    subset:  size of the square subsets [pixels]
+    window:  2D apodization window applied to every subset
+    shape:   shape of the reference frame
+"""
+
+# small fraction of the mean cross-power that keeps empty frequencies from
+# dominating the phase correlation
+_EPSILON = 1e-2
+
+
+def _window(subset, window):
+    """Return the 2D apodization window for a subset."""
+    if window is None or window is False:
+        return np.ones((subset, subset))
+    if window is True or window == "hann":
+        w = np.hanning(subset + 2)[1:-1]
+        return np.outer(w, w)
+    w = np.asarray(window, dtype=float)
+    if w.shape != (subset, subset):
+        raise ValueError("window must be None, 'hann', or a %d x %d array." % (subset, subset))
+    return w
+
+
+def _spectra(subsets, window, workers):
+    """Return the spectra of zero-mean, windowed subsets (..., s, s)."""
+    a = subsets - subsets.mean(axis=(-2, -1), keepdims=True)
+    a *= window
+    return scipy.fft.rfft2(a, workers=workers)
+
+
+def reference_spectra(reference, subset=32, step=16, window="hann", workers=None):
+    """
+    Compute the spectra of all subsets of a reference frame.
+
+    The result can be passed to `track_displacement()` in place of the
+    reference frame so that the reference spectra are only computed once
+    when many frames or stacks are tracked.
+
+    Args:
+        reference: 2D reference frame
+        subset:    size of the square subsets [pixels]
+        step:      distance between subsets [pixels]
+        window:    'hann', None, or a (subset, subset) array
+        workers:   number of threads for the FFT (see `scipy.fft`)
+
+    Returns:
+        a `ReferenceSpectra`
+    """
+    reference = np.asarray(reference, dtype=float)
+    if reference.ndim != 2:
+        raise ValueError("The reference must be a 2D frame.")
+
+    if subset < 4 or step < 1:
+        raise ValueError("subset must be at least 4 and step at least 1.")
+
+    if min(reference.shape) < subset:
+        raise ValueError("The frame is smaller than one subset.")
+
+    rows = np.arange(0, reference.shape[0] - subset + 1, step)
+    cols = np.arange(0, reference.shape[1] - subset + 1, step)
+    w = _window(subset, window)
+
+    with _stage("reference_spectra", "fft") as st:
+        view = np.lib.stride_tricks.sliding_window_view(reference, (subset, subset))
+        spectra = _spectra(view[::step, ::step][: len(rows), : len(cols)], w, workers)
+        np.conjugate(spectra, out=spectra)
+        st.output(spectra)
+
+    return ReferenceSpectra(spectra, rows, cols, subset, w, reference.shape)
+
+
+def _gaussian_offset(m, c, p):
+    """Return the sub-pixel offset of a peak from three neighbouring values."""
+    tiny = np.finfo(float).tiny
+    lm = np.log(np.maximum(m, tiny))
+    lc = np.log(np.maximum(c, tiny))
+    lp = np.log(np.maximum(p, tiny))
+    denom = 2 * (lm - 2 * lc + lp)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(denom < 0, (lm - lp) / denom, 0.0)
+    return np.clip(offset, -0.5, 0.5)
+
+
+def _correlation_peak(ref, B, workers):
+    """
+    Find the phase-correlation peak of each subset.
+
+    Args:
+        ref:     `ReferenceSpectra`
+        B:       spectra of the frame subsets (..., ny, nx, s, s//2+1)
+        workers: number of threads for the FFT
+
+    Returns:
+        dy, dx, peak arrays with shape (..., ny, nx)
+    """
+    s = ref.subset
+    R = B * ref.spectra
+    magnitude = np.abs(R)
+    magnitude += _EPSILON * magnitude.mean(axis=(-2, -1), keepdims=True) + np.finfo(float).tiny
+    R /= magnitude
+    r = scipy.fft.irfft2(R, s=(s, s), workers=workers)
+
+    flat = r.reshape(r.shape[:-2] + (s * s,))
+    k = np.argmax(flat, axis=-1)[..., np.newaxis]
+    i, j = np.divmod(k, s)
+
+    def value(di, dj):
+        index = ((i + di) % s) * s + (j + dj) % s
+        return np.take_along_axis(flat, index, axis=-1)[..., 0]
+
+    c = value(0, 0)
+    dy = np.where(i < s // 2, i, i - s)[..., 0] + _gaussian_offset(value(-1, 0), c, value(1, 0))
+    dx = np.where(j < s // 2, j, j - s)[..., 0] + _gaussian_offset(value(0, -1), c, value(0, 1))
+    return dy, dx, c
+
+
+def _track_frame(ref, frame, iterations, workers):
+    """Track all subsets of one frame (see `track_displacement`)."""
+    s = ref.subset
+    view = np.lib.stride_tricks.sliding_window_view(frame, (s, s))
+    top = frame.shape[0] - s
+    left = frame.shape[1] - s
+    rows = np.broadcast_to(ref.rows[:, np.newaxis], ref.spectra.shape[:2])
+    cols = np.broadcast_to(ref.cols[np.newaxis, :], ref.spectra.shape[:2])
+
+    oy = np.zeros(rows.shape, dtype=int)
+    ox = np.zeros(cols.shape, dtype=int)
+    for _ in range(iterations):
+        y0 = np.clip(rows + oy, 0, top)
+        x0 = np.clip(cols + ox, 0, left)
+        B = _spectra(view[y0, x0], ref.window, workers)
+        dy, dx, peak = _correlation_peak(ref, B, workers)
+        dy += y0 - rows
+        dx += x0 - cols
+        oy = np.rint(dy).astype(int)
+        ox = np.rint(dx).astype(int)
+
+    return dy, dx, peak
+
+
+def track_displacement(reference, frames, subset=32, step=16, window="hann", iterations=3, workers=None):
+    """
+    Measure the displacement of every subset of one or more frames.
+
+    The reference may be a 2D frame or the result of `reference_spectra()`
+    (in which case `subset`, `step`, and `window` are ignored).  `frames`
+    may be a single 2D frame or a stack with shape (..., rows, cols); the
+    displacements then have shape (..., ny, nx).
+
+    Displacements up to about half the subset size can be measured.  The
+    first iteration finds the integer displacement of each subset and each
+    further iteration re-centers the subsets of the frame on the previous
+    estimate before refining.
+
+    Args:
+        reference:  2D reference frame or `ReferenceSpectra`
+        frames:     frame or stack of frames with the same size as the reference
+        subset:     size of the square subsets [pixels]
+        step:       distance between subsets [pixels]
+        window:     'hann', None, or a (subset, subset) array
+        iterations: number of correlation passes (1 or more)
+        workers:    number of threads for the FFT (see `scipy.fft`)
+
+    Returns:
+        a `Displacement`
+    """
+    if iterations < 1:
+        raise ValueError("iterations must be at least 1.")
+
+    if not isinstance(reference, ReferenceSpectra):
+        reference = reference_spectra(reference, subset, step, window, workers)
+
+    frames = np.asarray(frames, dtype=float)
+    if frames.shape[-2:] != reference.shape:
+        raise ValueError("Frames must have the same size as the reference %s." % (reference.shape,))
+
+    stack = frames.reshape((-1,) + reference.shape)
+    grid = reference.spectra.shape[:2]
+    dy = np.empty((len(stack),) + grid)
+    dx = np.empty_like(dy)
+    peak = np.empty_like(dy)
+
+    with _stage("track_displacement", "correlate") as st:
+        for n, frame in enumerate(stack):
+            dy[n], dx[n], peak[n] = _track_frame(reference, frame, iterations, workers)
+        st.output(dy)
+
+    shape = frames.shape[:-2] + grid
+    half = (reference.subset - 1) / 2
+    y, x = np.meshgrid(reference.rows + half, reference.cols + half, indexing="ij")
+    return Displacement(y, x, dy.reshape(shape), dx.reshape(shape), peak.reshape(shape))
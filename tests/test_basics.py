@@ -2,6 +2,7 @@
 
 import numpy as np
 import pytest
+import scipy.fft
 import pyspeckle
 
 
@@ -96,6 +97,21 @@ def test_Exponential_non_circular_shapes():
         assert np.max(result) <= 1.0
 
 
+@pytest.mark.parametrize("alpha", [0.5, 2])
+@pytest.mark.parametrize("M", [64, (40, 70)])
+def test_Exponential_annulus(M, alpha):
+    """Annular pupils with an obscuration set by alpha give real speckle."""
+    result = pyspeckle.create_Exponential(M, 4, alpha=alpha, shape="annulus", seed=1)
+    assert np.max(result) == 1
+
+
+@pytest.mark.parametrize("alpha, beta", [(0.5, 1), (2, 1), (1, 0.5)])
+def test_Exponential_3D_shell(alpha, beta):
+    """Shell pupils with an obscuration set by alpha and beta give real speckle."""
+    result = pyspeckle.create_Exponential_3D(24, 2, alpha=alpha, beta=beta, shape="shell", seed=1)
+    assert np.max(result) == 1
+
+
 def test_create_Exponential_invalid_pol1():
     """Test invalid polarization."""
     with pytest.raises(ValueError):
@@ -145,3 +161,55 @@ def test_annulus_mask():
     assert mask[4, 0]
     assert mask[4, 8]
     assert mask[8, 4]
+
+
+def test_multiscale_contrast_matches_direct():
+    """Multiscale contrast agrees with a direct window calculation."""
+    x = pyspeckle.create_Exponential(40, 2)
+    maps = pyspeckle.local_contrast_2D_multiscale(x, [3, (5, 7)])
+    assert maps[0].shape == (38, 38)
+    assert maps[1].shape == (36, 34)
+    w = x[10:15, 20:27]
+    assert np.isclose(maps[1][10, 20], np.std(w) / np.mean(w))
+
+
+def test_multiscale_contrast_average():
+    """Average contrast approaches unity for large windows."""
+    x = pyspeckle.create_Exponential(200, 2)
+    K = pyspeckle.local_contrast_2D_multiscale(x, [3, 9, 31], average=True)
+    assert K.shape == (3,)
+    assert K[0] < K[1] < K[2] < 1.2
+
+
+def test_multiscale_contrast_bad_size():
+    """Window larger than image raises an error."""
+    with pytest.raises(ValueError):
+        pyspeckle.local_contrast_2D_multiscale(np.ones((10, 10)), [11])
+
+
+def test_Exponential_rectangular():
+    """Rectangular output has the requested shape and unit contrast."""
+    result = pyspeckle.create_Exponential((120, 250), 2)
+    assert result.shape == (120, 250)
+    assert np.max(result) == 1.0
+    assert abs(np.std(result) / np.mean(result) - 1) < 0.15
+
+
+def test_Rayleigh_rectangular():
+    """Rectangular unpolarized output has the requested shape."""
+    result = pyspeckle.create_Rayleigh((30, 20), 3, alpha=2)
+    assert result.shape == (30, 20)
+
+
+def test_Exponential_3D_rectangular():
+    """Non-cubic 3D output has the requested shape."""
+    result = pyspeckle.create_Exponential_3D((8, 12, 10), 2, alpha=2, polarization=0.5)
+    assert result.shape == (8, 12, 10)
+    assert np.max(result) <= 1.0
+
+
+def test_grid_sizes_are_fast():
+    """Internal grids use FFT-friendly sizes and exact speckle sizes."""
+    L, radii = pyspeckle.pyspeckle._grid_sizes((1080, 1920), (3, 3))  # pylint: disable=protected-access
+    assert L == tuple(scipy.fft.next_fast_len(3 * n) for n in (1080, 1920))
+    assert np.allclose(np.array(L) / np.array(radii) / 2, 3)
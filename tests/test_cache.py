@@ -0,0 +1,70 @@
+"""Tests of the on-disk pattern cache."""
+
+import os
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def test_cache_hit(tmp_path):
+    """A second call returns a memory map of the stored result."""
+    calls = []
+
+    def gen(M, pps, seed=None):
+        calls.append(seed)
+        return pyspeckle.create_Exponential(M, pps, seed=seed)
+
+    cache = pyspeckle.SpeckleCache(tmp_path)
+    a = cache(gen, 32, 2, seed=1)
+    b = cache(gen, 32, 2, seed=1)
+    assert calls == [1]
+    assert isinstance(b, np.memmap)
+    assert not b.flags.writeable
+    assert np.array_equal(a, pyspeckle.create_Exponential(32, 2, seed=1))
+    assert np.array_equal(a, b)
+
+    cache(gen, 32, 2, seed=2)
+    assert calls == [1, 2]
+    assert cache.key(gen, 32, 2, seed=1) in cache
+
+
+def test_cache_keys(tmp_path):
+    """Keys depend on every argument and need an integer seed."""
+    cache = pyspeckle.SpeckleCache(tmp_path)
+    f = pyspeckle.create_Exponential
+    k = cache.key(f, 64, 4, seed=3)
+    assert k == cache.key(f, 64, 4, seed=np.int64(3))
+    assert k != cache.key(f, 64, 4, alpha=2, seed=3)
+    assert k != cache.key(pyspeckle.create_Rayleigh, 64, 4, seed=3)
+    assert cache.key(f, np.array([8, 8]), 2, seed=0) != cache.key(f, np.array([8, 9]), 2, seed=0)
+    with pytest.raises(ValueError):
+        cache.key(f, 64, 4)
+
+
+def test_cache_key_version(tmp_path, monkeypatch):
+    """Keys change with the pyspeckle version."""
+    cache = pyspeckle.SpeckleCache(tmp_path)
+    f = pyspeckle.create_Exponential
+    k = cache.key(f, 64, 4, seed=3)
+    monkeypatch.setattr(pyspeckle.cache, "__version__", pyspeckle.__version__ + ".post1")
+    assert k != cache.key(f, 64, 4, seed=3)
+
+
+def test_cache_eviction(tmp_path):
+    """The least recently used files are removed when the cache is full."""
+    size = 128 + 32 * 32 * 8
+    cache = pyspeckle.SpeckleCache(tmp_path, max_bytes=2 * size)
+    f = pyspeckle.create_Exponential
+    cache(f, 32, 2, seed=1)
+    cache(f, 32, 2, seed=2)
+    os.utime(cache.path(cache.key(f, 32, 2, seed=1)), (0, 0))
+    os.utime(cache.path(cache.key(f, 32, 2, seed=2)), (1, 1))
+    cache(f, 32, 2, seed=1)
+    cache(f, 32, 2, seed=3)
+    assert cache.key(f, 32, 2, seed=1) in cache
+    assert cache.key(f, 32, 2, seed=2) not in cache
+    assert cache.key(f, 32, 2, seed=3) in cache
+    assert cache.size() <= 2 * size
+
+    cache.clear()
+    assert cache.size() == 0
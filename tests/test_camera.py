@@ -0,0 +1,61 @@
+"""Tests of the camera model."""
+
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def test_camera_dtype():
+    """Bit depth selects the integer type."""
+    x = pyspeckle.create_Exponential(64, 2)
+    assert pyspeckle.camera_counts(x, bit_depth=8).dtype == np.uint8
+    img = pyspeckle.camera_counts(x, bit_depth=12, photons=1e5)
+    assert img.dtype == np.uint16
+    assert np.max(img) == 4095
+
+
+def test_camera_noiseless():
+    """Without noise the counts are the rounded scaled irradiance."""
+    x = np.linspace(0, 1, 101).reshape(1, 101)
+    img = pyspeckle.camera_counts(x, photons=200, shot_noise=False, gain=2, offset=3)
+    assert np.array_equal(img, np.floor(x * 100 + 3.5).astype(np.uint8))
+
+
+@pytest.mark.parametrize("dtype", [int, np.uint8, bool])
+def test_camera_integer_input(dtype):
+    """Integer and boolean irradiance is converted like floating point."""
+    x = np.array([[0, 1], [1, 0]], dtype=dtype)
+    img = pyspeckle.camera_counts(x, photons=10, shot_noise=False)
+    assert np.array_equal(img, [[0, 10], [10, 0]])
+    assert pyspeckle.camera_counts(x, photons=10, seed=0).shape == (2, 2)
+
+
+def test_camera_full_well():
+    """Full well limits the electrons in bright pixels."""
+    x = np.ones((4, 4))
+    img = pyspeckle.camera_counts(x, photons=1000, full_well=100, bit_depth=16)
+    assert np.all(img == 100)
+
+
+def test_camera_noise_statistics():
+    """Shot and read noise add in quadrature."""
+    x = np.full((500, 400), 0.5)
+    img = pyspeckle.camera_counts(x, photons=200, read_noise=5, bit_depth=10, seed=1)
+    assert abs(np.mean(img) - 100) < 0.5
+    assert abs(np.var(img.astype(float)) - 125) < 5
+
+
+def test_camera_seed_and_stack():
+    """Stacks are supported and seeds are reproducible."""
+    x = pyspeckle.create_Exponential(32, 2)
+    stack = np.stack([x, x, x])
+    a = pyspeckle.camera_counts(stack, read_noise=2, seed=5)
+    b = pyspeckle.camera_counts(stack, read_noise=2, seed=5)
+    assert a.shape == (3, 32, 32)
+    assert np.array_equal(a, b)
+
+
+def test_camera_invalid_args():
+    """Bad bit depth raises an error."""
+    with pytest.raises(ValueError):
+        pyspeckle.camera_counts(np.ones(3), bit_depth=17)
@@ -0,0 +1,85 @@
+"""Tests of correlated fields and the Gaussian copula."""
+
+import numpy as np
+import pytest
+import scipy.stats
+import pyspeckle
+
+
+def test_gaussian_field_statistics():
+    """Gaussian field has requested shape, mean, and stdev."""
+    x = pyspeckle.create_gaussian_field((256, 256), 10, 2, 4, seed=1)
+    assert x.shape == (256, 256)
+    assert abs(np.mean(x) - 10) < 0.2
+    assert abs(np.std(x) - 2) < 0.2
+
+
+def test_gaussian_field_correlation_length():
+    """Autocorrelation at one correlation length is about 1/e."""
+    x = pyspeckle.create_gaussian_field(20000, 0, 1, 10, seed=2)
+    acf = pyspeckle.autocorrelation(x)
+    assert abs(acf[10] - np.exp(-1)) < 0.1
+
+
+def test_gaussian_field_seed():
+    """Same seed gives the same 3D field."""
+    x = pyspeckle.create_gaussian_field((16, 16, 16), 0, 1, (2, 3, 4), seed=3)
+    y = pyspeckle.create_gaussian_field((16, 16, 16), 0, 1, (2, 3, 4), seed=3)
+    assert np.array_equal(x, y)
+
+
+def test_gaussian_field_invalid_args():
+    """Correlation length too large for the array."""
+    with pytest.raises(ValueError):
+        pyspeckle.create_gaussian_field((100, 10), 0, 1, 6)
+
+
+def test_inverse_cdf_table_exponential():
+    """Table matches the closed form inverse for exponential."""
+    z, values = pyspeckle.inverse_cdf_table("exponential")
+    expected = -np.log(scipy.stats.norm.sf(z))
+    assert np.allclose(values, expected)
+
+
+def test_apply_marginal_matches_direct():
+    """Interpolated mapping agrees with direct evaluation."""
+    table = pyspeckle.inverse_cdf_table("gamma", a=2)
+    z = np.random.default_rng(4).standard_normal(1000)
+    expected = scipy.stats.gamma.ppf(scipy.stats.norm.cdf(z), 2)
+    assert np.allclose(pyspeckle.apply_marginal(z, table), expected, rtol=1e-3, atol=1e-4)
+
+
+def test_apply_marginal_out():
+    """Results are written into out, which must be contiguous float64."""
+    table = pyspeckle.inverse_cdf_table("exponential")
+    z = np.random.default_rng(5).standard_normal((4, 4))
+    out = np.empty((4, 4))
+    assert pyspeckle.apply_marginal(z, table, out=out) is out
+    assert np.array_equal(out, pyspeckle.apply_marginal(z, table))
+    with pytest.raises(ValueError):
+        pyspeckle.apply_marginal(z, table, out=np.full((8, 4), -7.0)[::2])
+    with pytest.raises(ValueError):
+        pyspeckle.apply_marginal(z, table, out=np.empty((4, 4), dtype=np.float32))
+
+
+def test_copula_field_exponential():
+    """Exponential copula field has unit mean and unit contrast."""
+    x = pyspeckle.create_copula_field((512, 512), 3, "exponential", seed=5)
+    assert x.shape == (512, 512)
+    assert np.min(x) >= 0
+    assert abs(np.mean(x) - 1) < 0.1
+    assert abs(np.std(x) / np.mean(x) - 1) < 0.1
+
+
+def test_copula_field_empirical():
+    """Empirical marginal stays within the range of its samples."""
+    samples = np.random.default_rng(6).uniform(2, 3, 1000)
+    x = pyspeckle.create_copula_field(4096, 5, samples, seed=7)
+    assert np.min(x) >= np.min(samples)
+    assert np.max(x) <= np.max(samples)
+
+
+def test_copula_bad_marginal():
+    """Unknown distribution name raises an error."""
+    with pytest.raises(ValueError):
+        pyspeckle.inverse_cdf_table("bogus")
@@ -0,0 +1,49 @@
+"""Tests of subjective speckle imaging."""
+
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def test_subjective_shape_and_contrast():
+    """Imaged rough surface gives fully developed speckle."""
+    obj = pyspeckle.random_phase_object((256, 256), seed=1)
+    img = pyspeckle.create_Subjective(obj, 0.1, 0.5, 1)
+    assert img.shape == (256, 256)
+    assert abs(np.std(img) / np.mean(img) - 1) < 0.1
+
+
+def test_subjective_binning():
+    """Camera pixels average several object samples."""
+    obj = pyspeckle.random_phase_object((2, 128, 128), seed=2)
+    img = pyspeckle.create_Subjective(obj, 0.1, 0.5, 1, magnification=2, pixel_size=8)
+    assert img.shape == (2, 32, 32)
+    single = pyspeckle.create_Subjective(obj[1], 0.1, 0.5, 1, magnification=2, pixel_size=8)
+    assert np.allclose(img[1], single)
+
+
+def test_pupil_is_cached():
+    """Same optical parameters reuse the transfer function."""
+    H1 = pyspeckle.pupil_transfer_function((64, 64), 0.2, 0.5, 1, pupil="annular", obscuration=0.5)
+    H2 = pyspeckle.pupil_transfer_function((64, 64), 0.2, 0.5, 1, pupil="annular", obscuration=0.5)
+    assert H1 is H2
+    assert H1[0, 0] == 0
+    assert not H1.flags.writeable
+
+
+def test_defocus_keeps_energy():
+    """Defocus is a pure phase and does not change the total irradiance."""
+    obj = pyspeckle.random_phase_object((128, 128), seed=3)
+    a = pyspeckle.create_Subjective(obj, 0.2, 0.5, 1)
+    b = pyspeckle.create_Subjective(obj, 0.2, 0.5, 1, defocus=2)
+    assert np.isclose(np.sum(a), np.sum(b))
+    assert not np.allclose(a, b)
+
+
+def test_subjective_invalid_args():
+    """Undersampled object and non-integer binning raise errors."""
+    obj = pyspeckle.random_phase_object((32, 32))
+    with pytest.raises(ValueError):
+        pyspeckle.create_Subjective(obj, 0.9, 0.5, 1)
+    with pytest.raises(ValueError):
+        pyspeckle.create_Subjective(obj, 0.1, 0.5, 1, pixel_size=1.5)
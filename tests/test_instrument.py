@@ -0,0 +1,39 @@
+"""Tests of stage instrumentation."""
+
+import pyspeckle
+
+
+def test_record_stages_exponential():
+    """Every stage of create_Exponential is recorded."""
+    with pyspeckle.record_stages() as rec:
+        pyspeckle.create_Exponential(32, 2)
+    stages = [r.stage for r in rec.records if r.routine == "create_Exponential"]
+    assert stages == ["phase", "mask", "exp", "fft", "irradiance", "normalize"]
+    fft = rec.records[3]
+    assert fft.seconds >= 0
+    assert fft.dtype == "complex128"
+    assert fft.nbytes == 16 * fft.shape[0] * fft.shape[1]
+    assert fft.peak_bytes is None
+
+
+def test_record_stages_trace_memory():
+    """Peak memory is reported when tracing is requested."""
+    with pyspeckle.record_stages(trace_memory=True) as rec:
+        pyspeckle.local_contrast_2D_multiscale(pyspeckle.create_Exponential(32, 2), [3, 5])
+    assert all(r.peak_bytes is not None for r in rec.records)
+    assert ("local_contrast_2D_multiscale", "window 5x5") in rec.totals()
+    assert rec.as_dicts()[0]["routine"] == "create_Exponential"
+
+
+def test_stage_callback():
+    """Callbacks receive records only while registered."""
+    seen = []
+    pyspeckle.add_stage_callback(seen.append)
+    try:
+        pyspeckle.create_Exponential_3D(8, 2)
+    finally:
+        pyspeckle.remove_stage_callback(seen.append)
+    n = len(seen)
+    assert n == 6
+    pyspeckle.create_Exponential_3D(8, 2)
+    assert len(seen) == n
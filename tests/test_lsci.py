@@ -0,0 +1,97 @@
+"""Tests of contrast to correlation time conversion."""
+
+import numpy as np
+import pytest
+import scipy.integrate
+import pyspeckle
+
+
+@pytest.mark.parametrize("model", ["lorentzian", "gaussian"])
+def test_contrast_model(model):
+    """The closed forms match numerical integration of g2."""
+
+    def g1(t):
+        return np.exp(-t) if model == "lorentzian" else np.exp(-t * t)
+
+    beta, rho, nu = 0.8, 0.7, 0.01
+    for x in [0.05, 1, 30]:
+
+        def integrand(t):
+            return (1 - t / x) * (rho**2 * g1(t) ** 2 + 2 * rho * (1 - rho) * g1(t) + (1 - rho) ** 2)
+
+        K2 = beta * 2 / x * scipy.integrate.quad(integrand, 0, x, limit=200)[0] + nu
+        assert np.isclose(pyspeckle.speckle_contrast(x, 1, model, beta, rho, nu), np.sqrt(K2))
+
+
+@pytest.mark.parametrize("model", ["lorentzian", "gaussian"])
+@pytest.mark.parametrize("a", [1, 2])
+def test_exposure_average_derivative(model, a):
+    """Exposure averages and their derivatives are accurate from 1e-8 to 1e3."""
+
+    def g1a_minus_1(t):
+        return np.expm1(-a * t) if model == "lorentzian" else np.expm1(-a * t * t)
+
+    x = np.geomspace(1e-8, 1e3, 45)
+    f = pyspeckle.lsci._exposure_average(x, a, model)
+    df = pyspeckle.lsci._exposure_average_derivative(x, a, model)
+
+    # dA/dx = 2/x ∫ (2s - 1)(g(xs) - 1) ds from 0 to 1 has no cancellation
+    for xi, fi, dfi in zip(x, f, df):
+        A = 2 * scipy.integrate.quad(lambda s: (1 - s) * (1 + g1a_minus_1(xi * s)), 0, 1, epsabs=0, limit=200)[0]
+        dA = 2 / xi * scipy.integrate.quad(lambda s: (2 * s - 1) * g1a_minus_1(xi * s), 0, 1, epsabs=0, limit=200)[0]
+        assert np.isclose(fi, A, rtol=1e-12, atol=0)
+        assert np.isclose(dfi, dA, rtol=1e-9, atol=0)
+
+    # central differences, wherever the change in A is resolved
+    h = 1e-4 * x
+    fd = (pyspeckle.lsci._exposure_average(x + h, a, model) - pyspeckle.lsci._exposure_average(x - h, a, model)) / (
+        2 * h
+    )
+    assert np.all(np.abs(fd - df) <= 1e-6 * np.abs(df) + 1e-15 / h)
+
+
+@pytest.mark.parametrize("model", ["lorentzian", "gaussian"])
+@pytest.mark.parametrize("rho", [1, 0.6])
+def test_round_trip(model, rho):
+    """Tabulated inversion recovers the correlation time."""
+    tau = np.geomspace(1e-6, 0.4, 20000).reshape(100, 200)
+    K = pyspeckle.speckle_contrast(5e-3, tau, model, beta=0.8, rho=rho, nu=0.001)
+    result = pyspeckle.correlation_time(K, 5e-3, model, beta=0.8, rho=rho, nu=0.001)
+    assert result.shape == (100, 200)
+    assert np.allclose(result, tau, rtol=1e-6)
+    assert np.allclose(pyspeckle.flow_index(K, 5e-3, model, beta=0.8, rho=rho, nu=0.001), 1 / tau, rtol=1e-6)
+
+
+def test_out_of_range():
+    """Contrasts beyond the table are clamped and NaN is preserved."""
+    table = pyspeckle.contrast_table()
+    assert table is pyspeckle.contrast_table()
+    tau = pyspeckle.correlation_time([np.nan, -1, 0, 2], T=1, table=table)
+    assert np.isnan(tau[0])
+    assert np.allclose(tau[1:], [1e-4, 1e-4, 100])
+    with pytest.raises(ValueError):
+        pyspeckle.contrast_table(model="plug")
+    with pytest.raises(ValueError):
+        pyspeckle.contrast_table(rho=0)
+
+
+def test_out():
+    """Correlation times can be written into a preallocated array."""
+    K = np.array([[0.5, 0.6], [0.7, 0.8]])
+    out = np.empty((2, 2))
+    tau = pyspeckle.correlation_time(K, out=out)
+    assert tau is out
+    assert np.allclose(out, pyspeckle.correlation_time(K))
+    with pytest.raises(ValueError):
+        pyspeckle.correlation_time(K, out=np.empty((2, 4))[:, ::2])
+
+
+@pytest.mark.parametrize("model", ["lorentzian", "gaussian"])
+def test_scalar(model):
+    """A scalar contrast gives a scalar correlation time."""
+    K = pyspeckle.speckle_contrast(1e-3, 2e-4, model)
+    tau = pyspeckle.correlation_time(K, 1e-3, model)
+    assert np.ndim(tau) == 0
+    assert np.isclose(tau, 2e-4, rtol=1e-6)
+    assert np.isclose(pyspeckle.flow_index(K, 1e-3, model), 1 / 2e-4, rtol=1e-6)
+    assert np.isnan(pyspeckle.correlation_time(np.nan))
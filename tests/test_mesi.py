@@ -0,0 +1,134 @@
+"""Tests of multi-exposure speckle imaging fits."""
+
+import numpy as np
+import pytest
+import pyspeckle
+
+T = np.geomspace(5e-5, 8e-2, 15)
+
+
+def synthetic(model, shape=(20, 30), seed=0):
+    """Return exposure contrasts and the parameters that produced them."""
+    rng = np.random.default_rng(seed)
+    tau = 10 ** rng.uniform(-4.5, -3, shape)
+    rho = rng.uniform(0.5, 1, shape)
+    nu = rng.uniform(0, 0.005, shape)
+    K = pyspeckle.speckle_contrast(T[:, None, None], tau, model, 0.8, rho, nu)
+    return K, tau, rho, nu
+
+
+@pytest.mark.parametrize("model", ["lorentzian", "gaussian"])
+def test_recovers_parameters(model):
+    """Noise-free contrasts are fitted to the parameters that made them."""
+    K, tau, rho, nu = synthetic(model)
+    fit = pyspeckle.fit_mesi(K, T, beta=0.8, model=model, chunk=128)
+    assert fit.tau_c.shape == (20, 30)
+    assert np.median(np.abs(fit.tau_c / tau - 1)) < 1e-3
+    assert np.median(np.abs(fit.rho - rho)) < 1e-3
+    assert np.median(np.abs(fit.nu - nu)) < 1e-4
+    assert np.all(fit.rms < 1e-3)
+
+
+def test_workers_agree():
+    """Threaded and serial fits of the same blocks are identical."""
+    K, _, _, _ = synthetic("lorentzian")
+    serial = pyspeckle.fit_mesi(K, T, beta=0.8, chunk=100, workers=1)
+    threaded = pyspeckle.fit_mesi(K, T, beta=0.8, chunk=100, workers=4)
+    for a, b in zip(serial, threaded):
+        assert np.array_equal(a, b)
+
+
+def test_bounds():
+    """Fitted fractions and noise stay within their physical ranges."""
+    K, _, _, _ = synthetic("lorentzian")
+    K = K * (1 + 0.02 * np.random.default_rng(1).standard_normal(K.shape))
+    fit = pyspeckle.fit_mesi(K, T, beta=0.8)
+    assert np.all((fit.rho > 0) & (fit.rho <= 1))
+    assert np.all(fit.nu >= 0)
+    assert np.all(np.isfinite(fit.tau_c))
+
+
+@pytest.mark.parametrize("model", ["lorentzian", "gaussian"])
+def test_nearly_static(model):
+    """Correlation times far beyond the longest exposure converge."""
+    tau = np.geomspace(1, 1e3, 12)
+    K = pyspeckle.speckle_contrast(T[:, None], tau, model, 0.8, 0.7, 0.002)
+    fit = pyspeckle.fit_mesi(K, T, beta=0.8, model=model, workers=1)
+    assert np.all(fit.iterations < 100)
+    assert np.all(fit.rms < 1e-10)
+    if model == "lorentzian":
+        # the gaussian contrast only determines a combination of ρ and τc here
+        assert np.allclose(fit.tau_c, tau, rtol=1e-3)
+        assert np.allclose(fit.rho, 0.7, rtol=1e-3)
+
+
+def dynamic_frames(T, tau, rho, n=64, pps=4, seed=0):
+    """
+    Simulate speckle frames integrated over each exposure time.
+
+    The dynamic field is a band-limited complex Gaussian field that evolves
+    as an AR(1) process, so g1(t) = exp(-t/tau), and it is added coherently
+    to a static field.
+
+    Returns:
+        frames (exposures, n, n) and the static irradiance (n, n)
+    """
+    rng = np.random.default_rng(seed)
+    f = np.fft.fftfreq(n)
+    pupil = np.hypot(*np.meshgrid(f, f, indexing="ij")) < 1 / (2 * pps)
+
+    def field():
+        E = np.fft.ifft2((rng.standard_normal((n, n)) + 1j * rng.standard_normal((n, n))) * pupil)
+        return E / np.sqrt(np.mean(np.abs(E) ** 2))
+
+    dt = tau / 10
+    a = np.exp(-dt / tau)
+    ends = {int(round(t / dt)): i for i, t in enumerate(T)}
+    static, dynamic = field(), field()
+    total = np.zeros((n, n))
+    frames = np.empty((len(T), n, n))
+    for k in range(1, max(ends) + 1):
+        dynamic = a * dynamic + np.sqrt(1 - a * a) * field()
+        total += np.abs(np.sqrt(rho) * dynamic + np.sqrt(1 - rho) * static) ** 2
+        if k in ends:
+            frames[ends[k]] = total / k
+    return frames, np.abs(static) ** 2
+
+
+def test_multi_exposure_contrast():
+    """Static speckle has contrast near one in windows of valid size."""
+    frames = np.stack([pyspeckle.create_Exponential(64, 2, seed=i) for i in range(3)])
+    K = pyspeckle.multi_exposure_contrast(frames, 7)
+    assert K.shape == (3, 58, 58)
+    assert 0.8 < np.median(K) < 1.1
+    assert pyspeckle.multi_exposure_contrast(frames, (5, 9)).shape == (3, 60, 56)
+
+
+@pytest.mark.filterwarnings("error")
+def test_end_to_end():
+    """Correlation time is recovered from simulated multi-exposure frames."""
+    tau = 1e-3
+    T = tau * np.geomspace(0.5, 50, 8)
+    frames, static = dynamic_frames(T, tau, rho=0.8)
+
+    # coherence factor calibrated on the static speckle
+    beta = np.median(pyspeckle.multi_exposure_contrast(static[np.newaxis], 7)) ** 2
+    K = pyspeckle.multi_exposure_contrast(frames, 7)
+    assert np.all(np.diff(np.median(K, axis=(1, 2))) < 0)
+
+    fit = pyspeckle.fit_mesi(K, T, beta=beta)
+    assert abs(np.median(fit.tau_c) / tau - 1) < 0.3
+    assert np.all(np.isfinite(fit.tau_c))
+
+
+def test_invalid():
+    """Mismatched shapes and too few exposures are rejected."""
+    K, _, _, _ = synthetic("lorentzian")
+    with pytest.raises(ValueError):
+        pyspeckle.fit_mesi(K, T[:-1])
+    with pytest.raises(ValueError):
+        pyspeckle.fit_mesi(K[:2], T[:2])
+    with pytest.raises(ValueError):
+        pyspeckle.fit_mesi(K, -T)
+    with pytest.raises(ValueError):
+        pyspeckle.multi_exposure_contrast(K[0], 3)
@@ -0,0 +1,78 @@
+"""Tests of the generation planner and its engines."""
+
+import numpy as np
+import pytest
+import scipy.signal
+import pyspeckle
+
+
+def test_engines_agree_2D():
+    """All engines give the same speckle for the same phases."""
+    results = []
+    for engine in ["full", "pruned", "zoom"]:
+        np.random.seed(1)
+        results.append(pyspeckle.create_Exponential((60, 45), 3.3, alpha=1.5, engine=engine))
+    assert np.allclose(results[0], results[1])
+    assert np.allclose(results[0], results[2])
+
+
+def test_engines_agree_3D():
+    """All engines agree in 3D with a shell pupil."""
+    results = []
+    for engine in ["full", "pruned", "zoom"]:
+        np.random.seed(2)
+        results.append(pyspeckle.create_Exponential_3D((12, 16, 10), 2, alpha=0.5, shape="shell", engine=engine))
+    assert np.max(results[0]) == 1
+    assert np.count_nonzero(results[0] > 0.1) > 10
+    assert np.allclose(results[0], results[1])
+    assert np.allclose(results[0], results[2])
+
+
+def test_single_precision():
+    """Single precision gives float32 output."""
+    x = pyspeckle.create_Exponential(32, 2, precision="single")
+    assert x.dtype == np.float32
+    assert np.max(x) == 1
+
+
+def test_plan_prefers_pruned_for_large_3D():
+    """The pruned and zoom engines need far less memory for large volumes."""
+    full = pyspeckle.plan_Exponential(128, 4, ndim=3, engine="full")
+    pruned = pyspeckle.plan_Exponential(128, 4, ndim=3, engine="pruned")
+    zoom = pyspeckle.plan_Exponential(128, 4, ndim=3, engine="zoom")
+    assert full.grid == (512, 512, 512)
+    assert full.peak_bytes > 2**32
+    assert pruned.peak_bytes < full.peak_bytes / 4
+    assert zoom.peak_bytes < full.peak_bytes / 4
+    assert pyspeckle.plan_Exponential(128, 4, ndim=3).engine != "full"
+
+
+def test_zoom_cost_independent_of_speckle_size():
+    """The zoom engine cost does not grow with pix_per_speckle."""
+    small = pyspeckle.plan_Exponential(512, 4, engine="zoom")
+    large = pyspeckle.plan_Exponential(512, 37.5, engine="zoom")
+    assert large.peak_bytes == small.peak_bytes
+    assert large.flops == small.flops
+    assert pyspeckle.plan_Exponential(512, 37.5).engine == "zoom"
+    assert pyspeckle.plan_Exponential(512, 2).engine != "zoom"
+
+
+def test_plan_memory_budget():
+    """Budget forces single precision or fails before allocating."""
+    double = pyspeckle.plan_Exponential(64, 4, ndim=3)
+    plan = pyspeckle.plan_Exponential(64, 4, ndim=3, precision="auto", max_memory=double.peak_bytes - 1)
+    assert plan.precision == "single"
+    with pytest.raises(MemoryError):
+        pyspeckle.create_Exponential_3D(128, 4, max_memory=2**20)
+
+
+def test_plan_contrast():
+    """FFT correlation is chosen for large kernels and gives the same contrast."""
+    assert pyspeckle.plan_contrast((500, 500), (3, 3)).engine == "direct"
+    assert pyspeckle.plan_contrast((500, 500), np.ones((40, 40))).engine == "fft"
+    x = pyspeckle.create_Exponential(100, 2)
+    k = np.ones((30, 30))
+    C, _ = pyspeckle.local_contrast_2D(x, k)
+    mu = scipy.signal.correlate2d(x, k, mode="same") / k.sum()
+    var = scipy.signal.correlate2d((x - mu) ** 2, k, mode="same") / k.sum() ** 2
+    assert np.allclose(C, np.sqrt(var) / mu)
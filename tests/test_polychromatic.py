@@ -0,0 +1,60 @@
+"""Tests of broadband speckle."""
+
+import numpy as np
+import pytest
+import pyspeckle
+from pyspeckle.pyspeckle import _zoom_dft
+
+
+def test_zoom_dft():
+    """The chirp-z transform matches a direct DFT for a batch of spacings."""
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(3, 4, 17)) + 1j * rng.normal(size=(3, 4, 17))
+    step = np.array([[0.01], [0.03], [0.07]])
+    start = np.array([[-0.2], [0.1], [0.3]])
+    y = _zoom_dft(x, 40, step, start)
+    for b in range(3):
+        f = start[b, 0] + step[b, 0] * np.arange(40)
+        assert np.allclose(y[b], x[b] @ np.exp(-2j * np.pi * np.outer(np.arange(17), f)))
+
+
+def test_monochromatic():
+    """A single wavelength gives fully developed speckle of the right size."""
+    x = pyspeckle.create_Polychromatic((200, 256), 4, [0.633], seed=1)
+    assert x.shape == (200, 256)
+    assert np.max(x) == 1
+    assert abs(np.std(x) / np.mean(x) - 1) < 0.1
+    r = pyspeckle.autocorrelation(x[100])
+    assert 1 < np.argmax(r < 0.5) <= 4
+
+
+def test_bandwidth_lowers_contrast():
+    """Broad spectra on rough surfaces average the speckle."""
+    wavelengths = np.linspace(0.6, 0.66, 16)
+    narrow = pyspeckle.create_Polychromatic(128, 4, wavelengths, roughness=0.3, seed=2)
+    broad = pyspeckle.create_Polychromatic(128, 4, wavelengths, roughness=30, seed=2)
+    assert np.std(broad) / np.mean(broad) < 0.5 * np.std(narrow) / np.mean(narrow)
+
+
+def test_batches_and_weights():
+    """The batch size does not change the result and zero weights are ignored."""
+    wavelengths = np.linspace(0.6, 0.66, 5)
+    a = pyspeckle.create_Polychromatic(48, 3.3, wavelengths, batch=1, seed=3)
+    b = pyspeckle.create_Polychromatic(48, 3.3, wavelengths, batch=3, seed=3)
+    assert np.allclose(a, b)
+
+    w = [0, 0, 1, 0, 0]
+    c = pyspeckle.create_Polychromatic(48, 3.3, wavelengths, weights=w, seed=3)
+    d = pyspeckle.create_Polychromatic(48, 3.3, [0.63], center=0.63, seed=3)
+    assert np.allclose(c, d)
+
+    with pytest.raises(ValueError):
+        pyspeckle.create_Polychromatic(48, 3, wavelengths, weights=[1, 2])
+
+
+@pytest.mark.parametrize("M", [64, (48, 80)])
+def test_annulus(M):
+    """An annular pupil with an obscuration set by alpha gives real speckle."""
+    x = pyspeckle.create_Polychromatic(M, 4, [0.6, 0.63], alpha=0.5, shape="annulus", seed=1)
+    assert np.max(x) == 1
+    assert abs(np.std(x) / np.mean(x) - 1) < 0.3
@@ -0,0 +1,63 @@
+"""Tests of speckle evaluated at arbitrary coordinates."""
+
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def grid(dims):
+    """Return the integer coordinates of every pixel of an array."""
+    return np.stack(np.meshgrid(*[np.arange(n) for n in dims], indexing="ij"), axis=-1)
+
+
+@pytest.mark.parametrize("M, pps", [(64, 4), ((48, 80), 3.5)])
+def test_matches_grid(M, pps):
+    """Sampling every pixel reproduces create_Exponential."""
+    ref = pyspeckle.create_Exponential(M, pps, seed=3)
+    y = pyspeckle.create_Exponential_at(grid(ref.shape), M, pps, seed=3)
+    assert y.shape == ref.shape
+    assert np.allclose(y / y.max(), ref)
+
+
+def test_matches_grid_annulus():
+    """Annular pupils match create_Exponential too."""
+    ref = pyspeckle.create_Exponential(48, 4, alpha=0.5, shape="annulus", seed=3)
+    y = pyspeckle.create_Exponential_at(grid(ref.shape), 48, 4, alpha=0.5, shape="annulus", seed=3)
+    assert np.max(ref) == 1
+    assert np.allclose(y / y.max(), ref)
+
+
+def test_matches_grid_3D():
+    """Sampling every voxel reproduces create_Exponential_3D."""
+    ref = pyspeckle.create_Exponential_3D((20, 24, 28), 3, seed=3)
+    y = pyspeckle.create_Exponential_at(grid(ref.shape), (20, 24, 28), 3, seed=3)
+    assert np.allclose(y / y.max(), ref)
+
+
+def test_scattered_points():
+    """Scattered samples have exponential statistics and are reproducible."""
+    points = np.random.default_rng(1).uniform(0, 256, (3, 2000, 2))
+    y = pyspeckle.create_Exponential_at(points, 256, 4, seed=7, chunk=500)
+    assert y.shape == (3, 2000)
+    assert abs(np.mean(y) - 1) < 0.1
+    assert abs(np.std(y) / np.mean(y) - 1) < 0.1
+    assert np.array_equal(y, pyspeckle.create_Exponential_at(points, 256, 4, seed=7))
+
+
+def test_nufft_matches_direct():
+    """The non-uniform FFT agrees with direct summation."""
+    pytest.importorskip("finufft")
+    points = np.random.default_rng(2).uniform(-50, 300, (1000, 2))
+    direct = pyspeckle.create_Exponential_at(points, 256, 4, method="direct", seed=7)
+    nufft = pyspeckle.create_Exponential_at(points, 256, 4, method="nufft", seed=7)
+    assert np.allclose(direct, nufft, rtol=1e-6, atol=1e-8)
+
+
+def test_invalid():
+    """Bad coordinates and methods are rejected."""
+    with pytest.raises(ValueError):
+        pyspeckle.create_Exponential_at(np.zeros((5, 4)), 64, 4)
+    with pytest.raises(ValueError):
+        pyspeckle.create_Exponential_at(np.zeros((5, 2)), (64, 64, 64), 4)
+    with pytest.raises(ValueError):
+        pyspeckle.create_Exponential_at(np.zeros((5, 2)), 64, 4, method="fast")
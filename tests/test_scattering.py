@@ -0,0 +1,53 @@
+"""Tests of rough-surface scattering."""
+
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def test_rough_surface_statistics():
+    """Heights have the requested RMS and stacks are independent."""
+    h = pyspeckle.rough_surface((4, 256, 256), 0.1, 2, dx=0.5, seed=1)
+    assert h.shape == (4, 256, 256)
+    assert abs(np.std(h) - 0.1) < 0.01
+    assert abs(np.corrcoef(h[0].ravel(), h[1].ravel())[0, 1]) < 0.05
+    assert np.corrcoef(h[0, :, :-1].ravel(), h[0, :, 1:].ravel())[0, 1] > 0.9
+
+
+def test_specular_component():
+    """A slightly rough surface keeps exp(-(4 pi rms / wavelength)**2) of the power specular."""
+    x = pyspeckle.create_Scattered((512, 512), 0.02, 2, 0.633, 0.5, seed=2)
+    expected = np.exp(-((4 * np.pi * 0.02 / 0.633) ** 2))
+    assert abs(np.sum(x) / x.size - 1) < 1e-12
+    assert abs(x[256, 256] / np.sum(x) - expected) < 0.02
+
+
+def test_fully_developed():
+    """A very rough surface gives unit contrast speckle."""
+    x = pyspeckle.create_Scattered((2, 512, 512), 2, 0.5, 0.633, 0.5, spot=64, seed=3)
+    assert x.shape == (2, 512, 512)
+    assert abs(np.std(x) / np.mean(x) - 1) < 0.1
+
+
+def test_propagation_round_trip():
+    """Propagating forward and back returns the field and kernels are cached."""
+    field = pyspeckle.phase_screen(pyspeckle.rough_surface((64, 64), 0.1, 2, seed=4), 0.5)
+    for method in ("fresnel", "angular"):
+        E = pyspeckle.propagate(field, 0.5, 1, 20, method)
+        back = pyspeckle.propagate(E, 0.5, 1, -20, method)
+        assert np.allclose(back, field)
+
+    k1 = pyspeckle.propagation_kernel((64, 64), 0.5, 1, 20)
+    k2 = pyspeckle.propagation_kernel((64, 64), 0.5, 1, 20)
+    assert k1 is k2
+    assert not k1.flags.writeable
+
+
+def test_scattering_errors():
+    """Bad arguments are rejected."""
+    with pytest.raises(ValueError):
+        pyspeckle.propagate(np.ones((8, 8)), 0.5, 1, method="fresnel")
+    with pytest.raises(ValueError):
+        pyspeckle.phase_screen(np.zeros((8, 8)), 0.5, mode="mirror")
+    with pytest.raises(ValueError):
+        pyspeckle.rough_surface((8,), 1, 1)
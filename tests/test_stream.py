@@ -0,0 +1,93 @@
+"""Tests of the prefetching speckle stream."""
+
+import gc
+import threading
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def test_stream_shapes():
+    """Batches have the requested shape and dtype."""
+    with pyspeckle.SpeckleStream((16, 24), 2, batch_size=3, seed=1) as stream:
+        batch = next(stream)
+    assert batch.shape == (3, 16, 24)
+    assert batch.dtype == np.float32
+    assert np.allclose(batch.max(axis=(1, 2)), 1)
+
+
+def test_stream_deterministic():
+    """Results depend on the seed but not on threads or prefetch depth."""
+    a = list(pyspeckle.SpeckleStream(16, 2, batch_size=2, seed=5, max_batches=4, copy=True))
+    b = list(pyspeckle.SpeckleStream(16, 2, batch_size=2, seed=5, max_batches=4, threads=3, prefetch=3, copy=True))
+    c = list(pyspeckle.SpeckleStream(16, 2, batch_size=2, seed=6, max_batches=4, copy=True))
+    assert len(a) == 4
+    assert np.array_equal(np.array(a), np.array(b))
+    assert not np.array_equal(a[0], c[0])
+    assert not np.array_equal(a[0][0], a[0][1])
+    assert not np.array_equal(a[0], a[1])
+
+
+def test_stream_matches_generator():
+    """Each pattern equals a direct call with the same generator."""
+    kwargs = {"batch_size": 1, "seed": 3, "dtype": float, "generator": pyspeckle.create_Rayleigh}
+    with pyspeckle.SpeckleStream(32, 4, **kwargs) as stream:
+        batch = next(stream)
+    rng = pyspeckle.stream._pattern_seed(stream.entropy, 0, 0, 0)
+    assert np.array_equal(batch[0], pyspeckle.create_Rayleigh(32, 4, seed=rng))
+
+
+def test_stream_ring_reuse():
+    """Batches are views into a fixed ring of buffers."""
+    with pyspeckle.SpeckleStream(8, 2, batch_size=1, prefetch=1, seed=0) as stream:
+        first = next(stream)
+        next(stream)
+        third = next(stream)
+    assert stream.buffers.shape == (2, 1, 8, 8)
+    assert np.shares_memory(first, third)
+
+
+def test_stream_errors():
+    """Bad arguments and generator failures are reported."""
+    with pytest.raises(ValueError):
+        pyspeckle.SpeckleStream(8, 2, batch_size=0)
+
+    def broken(M, seed=None):
+        if seed.random() < 2:
+            raise RuntimeError("broken")
+        return np.zeros(M)
+
+    with pytest.raises(RuntimeError):
+        next(pyspeckle.SpeckleStream(8, generator=broken))
+
+
+def test_dataset_workers():
+    """The dataset yields single frames that follow the epoch and worker."""
+    ds = pyspeckle.SpeckleDataset(16, 2, seed=2, batch_size=4)
+    frames = [x for x, _ in zip(ds, range(6))]
+    assert frames[0].shape == (16, 16)
+
+    with pyspeckle.SpeckleStream(16, 2, seed=(2, 0), batch_size=4) as stream:
+        batches = np.concatenate([next(stream), next(stream)])
+    assert np.array_equal(np.array(frames), batches[:6])
+
+    ds.set_epoch(1)
+    assert not np.array_equal(next(iter(ds)), frames[0])
+
+    with pyspeckle.SpeckleStream(16, 2, seed=(2, 0), batch_size=4, worker=1, num_workers=2) as stream:
+        assert not np.array_equal(next(stream)[0], frames[0])
+
+
+def test_stream_abandoned():
+    """Streams dropped without close() stop their threads."""
+    before = set(threading.enumerate())
+    for _ in range(5):
+        for batch in pyspeckle.SpeckleStream(16, 2, batch_size=2, threads=2, seed=0):
+            assert batch.shape == (2, 16, 16)
+            break
+    gc.collect()
+
+    extra = set(threading.enumerate()) - before
+    for t in extra:
+        t.join(timeout=10)
+    assert not any(t.is_alive() for t in extra)
@@ -0,0 +1,53 @@
+"""Tests of the lazily tiled speckle field."""
+
+import numpy as np
+import pytest
+import pyspeckle
+
+
+def test_windows_overlap():
+    """Overlapping windows agree exactly, including negative coordinates."""
+    field = pyspeckle.SpeckleField(4, tile=64, seed=7)
+    a = field[-100:150, -30:220]
+    b = field.window(-20, 40, 100, 120)
+    assert a.shape == (250, 250)
+    assert np.array_equal(b, a[80:180, 70:190])
+
+
+@pytest.mark.parametrize("tile", [16, 100])
+def test_independent_of_cache(tile):
+    """Tiles recomputed after eviction are identical to the originals."""
+    field = pyspeckle.SpeckleField(3, tile=tile, seed=1, cache_tiles=2)
+    a = field[0:200, 0:200]
+    assert len(field._cache) <= 2
+    field.clear()
+    assert np.array_equal(a[50:70, 150:190], field[50:70, 150:190])
+    assert np.array_equal(a, pyspeckle.SpeckleField(3, tile=tile, seed=1)[0:200, 0:200])
+
+
+def test_statistics():
+    """The field is fully developed speckle with unit mean."""
+    x = pyspeckle.SpeckleField(4, tile=128, seed=2)[0:512, 0:512]
+    assert abs(np.mean(x) - 1) < 0.1
+    assert abs(np.std(x) / np.mean(x) - 1) < 0.1
+    assert not np.array_equal(x, pyspeckle.SpeckleField(4, tile=128, seed=3)[0:512, 0:512])
+
+
+def test_steps_and_dtype():
+    """Slices with steps subsample the window in the requested type."""
+    field = pyspeckle.SpeckleField(4, tile=32, seed=5, dtype=np.float32)
+    x = field[0:64, 10:74:2]
+    assert x.shape == (64, 32)
+    assert x.dtype == np.float32
+    assert np.array_equal(x, field[0:64, 10:74][:, ::2])
+
+
+def test_invalid():
+    """Unbounded or malformed indices are rejected."""
+    field = pyspeckle.SpeckleField(4)
+    with pytest.raises(ValueError):
+        field[:10, 0:10]
+    with pytest.raises(ValueError):
+        field[0:10]
+    with pytest.raises(ValueError):
+        pyspeckle.SpeckleField(0)
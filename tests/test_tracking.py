@@ -0,0 +1,55 @@
+"""Tests of speckle displacement tracking."""
+
+import numpy as np
+import pytest
+import scipy.fft
+import pyspeckle
+
+
+def _shift(x, dy, dx):
+    """Shift a band-limited pattern by a fraction of a pixel."""
+    ky = scipy.fft.fftfreq(x.shape[0])[:, np.newaxis]
+    kx = scipy.fft.fftfreq(x.shape[1])[np.newaxis, :]
+    return scipy.fft.ifft2(scipy.fft.fft2(x) * np.exp(-2j * np.pi * (ky * dy + kx * dx))).real
+
+
+def test_integer_shift():
+    """An integer roll is found exactly."""
+    x = pyspeckle.create_Exponential(128, 4, seed=1)
+    d = pyspeckle.track_displacement(x, np.roll(x, (2, -3), axis=(0, 1)))
+    assert d.dy.shape == (7, 7)
+    assert np.allclose(d.dy[1:-1, 1:-1], 2, atol=0.02)
+    assert np.allclose(d.dx[1:-1, 1:-1], -3, atol=0.02)
+    assert d.y[0, 0] == 15.5 and d.x[0, 1] == 31.5
+
+
+def test_subpixel_stack():
+    """Sub-pixel shifts of a stack are found with a cached reference."""
+    x = pyspeckle.create_Exponential(256, 4, seed=2)
+    shifts = [(0.3, -0.7), (2.5, 1.25), (-3.1, 0.45)]
+    frames = np.array([_shift(x, *s) for s in shifts])
+    ref = pyspeckle.reference_spectra(x, subset=32, step=32)
+    d = pyspeckle.track_displacement(ref, frames.reshape(3, 1, 256, 256))
+    assert d.dx.shape == (3, 1, 8, 8)
+    for n, (dy, dx) in enumerate(shifts):
+        assert abs(np.median(d.dy[n]) - dy) < 0.05
+        assert abs(np.median(d.dx[n]) - dx) < 0.05
+
+
+def test_identical_frames():
+    """A frame compared with itself has no displacement."""
+    x = pyspeckle.create_Exponential((96, 160), 3, seed=3)
+    d = pyspeckle.track_displacement(x, x, subset=16, step=8, window=None)
+    assert np.allclose(d.dy, 0) and np.allclose(d.dx, 0)
+    assert np.all(d.peak > 0.5)
+
+
+def test_tracking_errors():
+    """Bad arguments are rejected."""
+    x = np.zeros((64, 64))
+    with pytest.raises(ValueError):
+        pyspeckle.track_displacement(x, np.zeros((64, 32)))
+    with pytest.raises(ValueError):
+        pyspeckle.reference_spectra(x, subset=128)
+    with pytest.raises(ValueError):
+        pyspeckle.track_displacement(x, x, iterations=0)